@@ -0,0 +1,198 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+# Applies scripts to many .blend files with a pool of background blender workers.
+# Each worker is started once and processes files until the queue is empty (or --files-per-worker is reached),
+# so blender startup is paid per worker, not per file. A worker that does not answer within --timeout seconds
+# is killed, its file fails and a new worker continues with the next file.
+#
+#   python batch_runner.py files/*.blend --scripts setting_pmx create_pmx_materials --jobs 4 --save
+#
+# --blender accepts a full command line, e.g. "python benchmark/fake_blender.py" to run without blender.
+
+worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_worker.py")
+marker = "@@batch "
+
+class WorkerError(Exception):
+    pass
+
+class Worker():
+    def __init__(self, blender, scripts, save=False, log_level="INFO", timeout=None):
+        command = shlex.split(blender) + ["--background", "--factory-startup", "--python", worker_script, "--"]
+        command += ["--log-level", log_level]
+        if save:
+            command.append("--save")
+        command += ["--scripts"] + list(scripts)
+
+        self.files = 0
+        self.output = []
+        self.timeout = timeout
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        universal_newlines=True, encoding="utf-8", bufsize=1)
+
+        # stdout is read by a thread so that a hung worker can be timed out, None marks the end of the output
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self.read_output, daemon=True)
+        self.reader.start()
+        self.receive()
+
+    def read_output(self):
+        for line in self.process.stdout:
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def receive(self):
+        # blender's own output is kept and returned with the next response
+        deadline = None if self.timeout is None else time.perf_counter() + self.timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=None if deadline is None else max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                self.kill()
+                raise WorkerError("worker timed out after %g s" % self.timeout)
+
+            if line is None:
+                break
+            if line.startswith(marker):
+                return json.loads(line[len(marker):])
+            self.output.append(line)
+
+        raise WorkerError("worker exited with %s" % self.process.wait())
+
+    def run(self, file_path):
+        self.output = []
+        self.process.stdin.write(json.dumps({"file": file_path}) + "\n")
+        self.process.stdin.flush()
+
+        result = self.receive()
+        result["output"] = "".join(self.output)
+        self.files += 1
+        return result
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write(json.dumps({"quit": True}) + "\n")
+                self.process.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.kill()
+
+class BatchRunner():
+    def __init__(self, blender, scripts, jobs=None, files_per_worker=0, save=False, log_level="INFO", timeout=None):
+        self.blender = blender
+        self.scripts = scripts
+        self.jobs = jobs or os.cpu_count() or 1
+        self.files_per_worker = files_per_worker
+        self.save = save
+        self.log_level = log_level
+        self.timeout = timeout
+        self.results = []
+        self.lock = threading.Lock()
+
+    def execute(self, files):
+        start = time.perf_counter()
+
+        files_queue = queue.Queue()
+        for file_path in files:
+            files_queue.put(os.path.abspath(file_path))
+
+        threads = [threading.Thread(target=self.run_worker, args=(files_queue,)) for i in range(min(self.jobs, len(files)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.time = time.perf_counter() - start
+        return self.results
+
+    def new_worker(self):
+        return Worker(self.blender, self.scripts, self.save, self.log_level, self.timeout)
+
+    def run_worker(self, files_queue):
+        worker = None
+        while True:
+            try:
+                file_path = files_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            start = time.perf_counter()
+            try:
+                if worker is None:
+                    worker = self.new_worker()
+                result = worker.run(file_path)
+            except (WorkerError, OSError) as e:
+                # a crashed or timed out worker fails its file and is replaced for the next one
+                result = {"file": file_path, "ok": False, "error": str(e), "steps": {}, "log": "", "output": ""}
+                if worker is not None:
+                    result["output"] = "".join(worker.output)
+                    worker.close()
+                worker = None
+            result["wall_time"] = time.perf_counter() - start
+
+            with self.lock:
+                self.results.append(result)
+                print("%-5s %8.3f s  %s" % ("ok" if result["ok"] else "error", result["wall_time"], file_path), file=sys.stderr)
+
+            if worker is not None and self.files_per_worker and worker.files >= self.files_per_worker:
+                worker.close()
+                worker = None
+
+        if worker is not None:
+            worker.close()
+
+    def write_report(self, file_path):
+        if file_path.endswith(".csv"):
+            with open(file_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["file", "ok", "wall_time", "time"] + ["step:" + step for step in ["open"] + self.scripts + ["save"]])
+                for result in self.results:
+                    steps = result["steps"]
+                    row = [result["file"], result["ok"], result["wall_time"], result.get("time")]
+                    writer.writerow(row + [steps.get(step) for step in ["open"] + self.scripts + ["save"]])
+        else:
+            report = {"scripts": self.scripts, "jobs": self.jobs, "time": self.time, "results": self.results}
+            with open(file_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run scripts on many .blend files with background blender workers.")
+    parser.add_argument("files", nargs="+", help=".blend files")
+    parser.add_argument("--scripts", nargs="+", required=True, help="scripts to run on each file, in order (see batch_worker.entry_points)")
+    parser.add_argument("--blender", default="blender", help="blender command line")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of workers, default: cpu count")
+    parser.add_argument("--files-per-worker", type=int, default=0, help="restart a worker after this many files, 0: never")
+    parser.add_argument("--save", action="store_true", help="save each file after the scripts ran")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds per file (and worker startup) before the worker is killed, 0: none")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("-o", "--output", help="write a .json or .csv report")
+    args = parser.parse_args(argv)
+
+    runner = BatchRunner(args.blender, args.scripts, args.jobs, args.files_per_worker, args.save, args.log_level, args.timeout or None)
+    results = runner.execute(args.files)
+
+    if args.output:
+        runner.write_report(args.output)
+
+    failed = [result for result in results if not result["ok"]]
+    print("%d files, %d failed, %.3f s" % (len(results), len(failed), runner.time), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import bpy
+import importlib
+import json
+import os
+import sys
+import time
+import traceback
+
+# Runs inside background blender, started by batch_runner.py:
+#   blender --background --factory-startup --python batch_worker.py -- --scripts setting_pmx create_pmx_materials
+# Requests and responses are json lines on stdin / stdout, responses are prefixed with `marker`
+# because blender writes its own messages to stdout too.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import text_logging
+
+marker = "@@batch "
+
+entry_points = {
+    "setting_pmx": lambda module: module.SettingPMX().execute(),
+    "create_pmx_materials": lambda module: module.CreatePMXMaterials.execute_all(),
+    "create_rgb_morph_file": lambda module: module.CreateRGBMorphFile().execute(),
+}
+
+def send(message):
+    sys.stdout.write(marker + json.dumps(message, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+def get_args():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    args = {"scripts": [], "save": False, "log_level": "INFO"}
+    key = None
+    for arg in argv:
+        if arg == "--save":
+            args["save"] = True
+        elif arg in ("--scripts", "--log-level"):
+            key = arg[2:].replace("-", "_")
+        elif key == "scripts":
+            args["scripts"].append(arg)
+        elif key == "log_level":
+            args["log_level"] = arg
+            key = None
+    return args
+
+def run_file(file_path, modules, save, log_level):
+    result = {"file": file_path, "ok": True, "error": None, "steps": {}, "log": ""}
+
+    start = time.perf_counter()
+    try:
+        bpy.ops.wm.open_mainfile(filepath=file_path)
+        result["steps"]["open"] = time.perf_counter() - start
+
+        for name, module in modules:
+            handler = text_logging.RingBufferHandler()
+            handler.setFormatter(text_logging.formatter)
+            module.logger.setLevel(log_level)
+            module.logger.addHandler(handler)
+
+            step_start = time.perf_counter()
+            try:
+                entry_points[name](module)
+            finally:
+                result["steps"][name] = time.perf_counter() - step_start
+                module.logger.removeHandler(handler)
+                result["log"] += handler.getvalue()
+
+        if save:
+            step_start = time.perf_counter()
+            bpy.ops.wm.save_mainfile()
+            result["steps"]["save"] = time.perf_counter() - step_start
+    except Exception:
+        result["ok"] = False
+        result["error"] = traceback.format_exc()
+
+    result["time"] = time.perf_counter() - start
+    return result
+
+def main():
+    args = get_args()
+    modules = [(name, importlib.import_module(name)) for name in args["scripts"]]
+
+    send({"ready": True, "pid": os.getpid()})
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request.get("quit"):
+            break
+        send(run_file(request["file"], modules, args["save"], args["log_level"]))
+
+main()
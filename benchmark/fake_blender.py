@@ -0,0 +1,38 @@
+import os
+import runpy
+import sys
+
+# Stand-in for the blender executable, for batch_runner.py --blender "python benchmark/fake_blender.py".
+# Accepts `--background --factory-startup --python script.py -- args` and runs the script against fake_bpy.
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+
+from fake_bpy import bpy
+
+def op_wm_open_mainfile(filepath=""):
+    if not os.path.exists(filepath):
+        raise RuntimeError("Error: Cannot read file '%s': No such file or directory" % filepath)
+
+    fake_bpy.reset()
+    bpy.data.filepath = filepath
+    print("Read blend: " + filepath)
+    return {'FINISHED'}
+
+def op_wm_save_mainfile(filepath=""):
+    print("Info: Saved '%s'" % os.path.basename(filepath or bpy.data.filepath))
+    return {'FINISHED'}
+
+fake_bpy.operators["wm.open_mainfile"] = op_wm_open_mainfile
+fake_bpy.operators["wm.save_mainfile"] = op_wm_save_mainfile
+
+def main():
+    argv = sys.argv[1:]
+    script = argv[argv.index("--python") + 1]
+
+    fake_bpy.install()
+    sys.argv = ["blender"] + argv
+    runpy.run_path(script, run_name="__main__")
+
+main()
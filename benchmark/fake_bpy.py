@@ -0,0 +1,868 @@
+import array
+import functools
+import math
+import os
+import sys
+import time
+import types
+
+# In-process stand-in for the parts of bpy / bmesh / bpy_extras (2.7x API) used by the scripts.
+# Every method call goes through @recorded and is counted and timed in `recorder`.
+
+class Recorder():
+    def __init__(self):
+        self.calls = {}
+
+    def reset(self):
+        self.calls = {}
+
+    def add(self, name, elapsed):
+        entry = self.calls.get(name)
+        if entry is None:
+            self.calls[name] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def report(self):
+        return {name: {"count": count, "time": elapsed} for name, (count, elapsed) in sorted(self.calls.items())}
+
+recorder = Recorder()
+
+def recorded(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class Vector(list):
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        super().__init__(float(v) for v in values)
+
+    x = property(lambda self: self[0], lambda self, v: self.__setitem__(0, v))
+    y = property(lambda self: self[1], lambda self, v: self.__setitem__(1, v))
+    z = property(lambda self: self[2], lambda self, v: self.__setitem__(2, v))
+
+    def copy(self):
+        return Vector(self)
+
+class PropCollection(list):
+    def values(self):
+        return list(self)
+
+    def keys(self):
+        return [item.name for item in self]
+
+    def find(self, name):
+        for i, item in enumerate(self):
+            if item.name == name:
+                return i
+        return -1
+
+    def get(self, name, default=None):
+        index = self.find(name)
+        return self[index] if index >= 0 else default
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            index = self.find(key)
+            if index < 0:
+                raise KeyError(key)
+            return list.__getitem__(self, index)
+        return list.__getitem__(self, key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self.find(key) >= 0
+        return list.__contains__(self, key)
+
+class Struct():
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class ID():
+    collection = None
+
+    def __init__(self, name):
+        self.id_name = name
+        self.id_properties = {}
+        self.users = 0
+        self.use_fake_user = False
+
+    def __getitem__(self, key):
+        return self.id_properties[key]
+
+    def __setitem__(self, key, value):
+        self.id_properties[key] = value
+
+    def __contains__(self, key):
+        return key in self.id_properties
+
+    def get(self, key, default=None):
+        return self.id_properties.get(key, default)
+
+    @property
+    def name(self):
+        return self.id_name
+
+    @name.setter
+    def name(self, name):
+        if self.collection is None:
+            self.id_name = name
+        else:
+            self.collection.rename(self, name)
+
+    def __repr__(self):
+        return "<%s %r>" % (type(self).__name__, self.name)
+
+class BlendDataCollection(PropCollection):
+    def __init__(self, label, factory):
+        super().__init__()
+        self.label = label
+        self.factory = factory
+        self.index = {}
+        self.suffixes = {}
+        self.new = recorded("data." + label + ".new")(self._new)
+        self.remove = recorded("data." + label + ".remove")(self._remove)
+
+    def find(self, name):
+        item = self.index.get(name)
+        return -1 if item is None else list.index(self, item)
+
+    def get(self, name, default=None):
+        return self.index.get(name, default)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.index[key]
+        return list.__getitem__(self, key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self.index
+        return key in self.index.values()
+
+    def unique_name(self, name):
+        if name not in self.index:
+            return name
+        i = self.suffixes.get(name, 1)
+        while "%s.%03d" % (name, i) in self.index:
+            i += 1
+        self.suffixes[name] = i
+        return "%s.%03d" % (name, i)
+
+    def rename(self, item, name):
+        if name == item.id_name:
+            return
+        del self.index[item.id_name]
+        item.id_name = self.unique_name(name)
+        self.index[item.id_name] = item
+
+    def _new(self, name, *args, **kwargs):
+        item = self.factory(self.unique_name(name), *args, **kwargs)
+        item.collection = self
+        self.index[item.id_name] = item
+        self.append(item)
+        return item
+
+    def _remove(self, item, do_unlink=True):
+        list.remove(self, item)
+        del self.index[item.id_name]
+        item.collection = None
+        if isinstance(item, Object):
+            item.data = None
+            for scene in bpy.data.scenes:
+                if item in scene.objects:
+                    scene.objects.unlink(item)
+
+# bpy.types
+
+class ElementCollection(PropCollection):
+    widths = {}
+
+    def __init__(self, label):
+        super().__init__()
+        self.label = label
+        self.count = 0
+        self.attributes = {}
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def add(self, count):
+        recorder.add("Mesh." + self.label + ".add", 0.0)
+        self.count += count
+        for attr, values in self.attributes.items():
+            values.extend(array.array(values.typecode, bytes(values.itemsize * count * self.widths.get(attr, 1))))
+
+    def foreach_set(self, attr, seq):
+        start = time.perf_counter()
+        width = self.widths.get(attr, 1)
+        typecode = "f" if attr in ("co", "normal", "bevel_weight_edge", "crease", "uv") else "i"
+        if attr.startswith("use_") or attr in ("hide", "select"):
+            typecode = "b"
+        values = array.array(typecode)
+        try:
+            view = memoryview(seq)
+        except TypeError:
+            view = None
+        formats = (typecode, "?") if typecode == "b" else (typecode,)
+        if view is not None and view.format in formats and view.c_contiguous:
+            values.frombytes(view.cast("B"))
+        else:
+            values.extend(seq)
+        if len(values) != self.count * width:
+            raise RuntimeError("internal error setting the array")
+        self.attributes[attr] = values
+        recorder.add("Mesh." + self.label + ".foreach_set", time.perf_counter() - start)
+
+    def foreach_get(self, attr, seq):
+        start = time.perf_counter()
+        width = self.widths.get(attr, 1)
+        values = self.attributes.get(attr)
+        if values is None:
+            values = array.array("f", bytes(4 * self.count * width))
+        if len(seq) != len(values):
+            raise RuntimeError("internal error getting the array")
+        seq[:] = values
+        recorder.add("Mesh." + self.label + ".foreach_get", time.perf_counter() - start)
+
+class MeshVertices(ElementCollection):
+    widths = {"co": 3, "normal": 3}
+
+class MeshEdges(ElementCollection):
+    widths = {"vertices": 2}
+
+class MeshPolygons(ElementCollection):
+    widths = {"normal": 3}
+
+class MeshLoops(ElementCollection):
+    widths = {}
+
+class MeshUVLoops(ElementCollection):
+    widths = {"uv": 2}
+
+class MeshUVLoopLayer():
+    def __init__(self, name, count):
+        self.name = name
+        self.data = MeshUVLoops("uv_layers.data")
+        self.data.count = count
+
+class MeshUVLoopLayers(PropCollection):
+    @property
+    def active(self):
+        return self[0] if self else None
+
+class MeshUVTextures(PropCollection):
+    def __init__(self, mesh):
+        super().__init__()
+        self.mesh = mesh
+
+    @recorded("Mesh.uv_textures.new")
+    def new(self, name="UVMap"):
+        # 2.7x: adding a uv texture adds the matching uv loop layer
+        texture = Struct(name=name)
+        self.append(texture)
+        self.mesh.uv_layers.append(MeshUVLoopLayer(name, len(self.mesh.loops)))
+        return texture
+
+class MeshMaterials(PropCollection):
+    append = recorded("Mesh.materials.append")(PropCollection.append)
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = MeshVertices("vertices")
+        self.edges = MeshEdges("edges")
+        self.polygons = MeshPolygons("polygons")
+        self.loops = MeshLoops("loops")
+        self.materials = MeshMaterials()
+        self.uv_layers = MeshUVLoopLayers()
+        self.uv_textures = MeshUVTextures(self)
+
+    @recorded("Mesh.copy")
+    def copy(self):
+        mesh = bpy.data.meshes.new(self.name)
+        for attr in ("vertices", "edges", "polygons", "loops"):
+            source = getattr(self, attr)
+            target = getattr(mesh, attr)
+            target.count = source.count
+            target.attributes = {key: array.array(values.typecode, values) for key, values in source.attributes.items()}
+        for material in self.materials:
+            list.append(mesh.materials, material)
+        return mesh
+
+    @recorded("Mesh.update")
+    def update(self, calc_edges=False):
+        pass
+
+    @recorded("Mesh.from_pydata")
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices.add(len(vertices))
+        self.vertices.foreach_set("co", [c for co in vertices for c in co])
+        self.edges.add(len(edges))
+        self.polygons.add(len(faces))
+        self.loops.add(sum(len(face) for face in faces))
+
+class MaterialTextureSlots(PropCollection):
+    @recorded("Material.texture_slots.add")
+    def add(self):
+        slot = Struct(texture=None)
+        self[self.index(None)] = slot
+        return slot
+
+class Material(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.texture_slots = MaterialTextureSlots([None] * 18)
+        self.node_tree = None
+
+class Texture(ID):
+    def __init__(self, name, type='IMAGE'):
+        super().__init__(name)
+        self.type = type
+        self.image = None
+
+class Armature(ID):
+    pass
+
+class Image(ID):
+    def __init__(self, name, filepath=""):
+        super().__init__(name)
+        self.filepath = filepath
+        self.library = None
+        self.packed_file = None
+        self.has_data = False
+        self.size = [0, 0]
+        self.channels = 4
+        self.is_float = False
+
+class TextCurve(ID):
+    def __init__(self, name, type='FONT'):
+        super().__init__(name)
+        self.body = ""
+
+class Text(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.lines = []
+        self.value = ""
+
+    @recorded("Text.clear")
+    def clear(self):
+        self.value = ""
+
+    @recorded("Text.write")
+    def write(self, text):
+        self.value += text
+
+    @recorded("Text.from_string")
+    def from_string(self, text):
+        self.value = text
+
+    def as_string(self):
+        return self.value
+
+class Driver():
+    def __init__(self):
+        self.type = 'SCRIPTED'
+        self.expression = ""
+        self.variables = DriverVariables()
+        self.use_self = False
+
+class DriverTarget():
+    def __init__(self):
+        self.id = None
+        self.data_path = ""
+
+class DriverVariable():
+    def __init__(self, name):
+        self.name = name
+        self.type = 'SINGLE_PROP'
+        self.targets = PropCollection([DriverTarget()])
+
+class DriverVariables(PropCollection):
+    @recorded("Driver.variables.new")
+    def new(self):
+        variable = DriverVariable("var" if not self else "var_%03d" % len(self))
+        self.append(variable)
+        return variable
+
+class FCurve():
+    def __init__(self, data_path, array_index):
+        self.data_path = data_path
+        self.array_index = array_index
+        self.driver = Driver()
+        self.keyframe_points = PropCollection()
+
+class AnimData():
+    def __init__(self):
+        self.drivers = PropCollection()
+        self.action = None
+
+class Constraint():
+    def __init__(self, type):
+        self.type = type
+        self.name = type.title().replace("_", " ")
+        self.target = None
+        self.influence = 1.0
+
+class ObjectConstraints(PropCollection):
+    @recorded("Object.constraints.new")
+    def new(self, type):
+        constraint = Constraint(type)
+        self.append(constraint)
+        return constraint
+
+class Modifier():
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.show_viewport = True
+        self.show_render = True
+
+class ObjectModifiers(PropCollection):
+    @recorded("Object.modifiers.new")
+    def new(self, name, type):
+        modifier = Modifier(name, type)
+        if type == 'ARRAY':
+            modifier.count = 2
+            modifier.use_relative_offset = True
+            modifier.relative_offset_displace = (1.0, 0.0, 0.0)
+            modifier.use_object_offset = False
+            modifier.offset_object = None
+        elif type == 'SOLIDIFY':
+            modifier.thickness = 0.01
+            modifier.offset = -1.0
+        self.append(modifier)
+        return modifier
+
+    @recorded("Object.modifiers.remove")
+    def remove(self, modifier):
+        list.remove(self, modifier)
+
+class Object(ID):
+    vector_attributes = ("location", "rotation_euler", "scale")
+
+    def __init__(self, name, data=None):
+        super().__init__(name)
+        self.data = data
+        self.scene_users = 0
+        if data is None:
+            self.type = 'EMPTY'
+        elif isinstance(data, Armature):
+            self.type = 'ARMATURE'
+        elif isinstance(data, TextCurve):
+            self.type = 'FONT'
+        else:
+            self.type = 'MESH'
+        self.location = (0.0, 0.0, 0.0)
+        self.rotation_euler = (0.0, 0.0, 0.0)
+        self.scale = (1.0, 1.0, 1.0)
+        self.lock_location = [False, False, False]
+        self.lock_rotation = [False, False, False]
+        self.lock_scale = [False, False, False]
+        self.layers = [True] + [False] * 19
+        self.parent = None
+        self.constraints = ObjectConstraints()
+        self.modifiers = ObjectModifiers()
+        self.animation_data = None
+        self.empty_draw_type = 'PLAIN_AXES'
+        self.empty_draw_size = 1.0
+        self.show_x_ray = False
+        self.select = False
+        self.hide = False
+        self.hide_select = False
+        self.hide_render = False
+        self.dupli_type = 'NONE'
+
+    def __setattr__(self, name, value):
+        if name == "data":
+            if getattr(self, "data", None) is not None:
+                self.data.users -= 1
+            if value is not None:
+                value.users += 1
+        elif name in self.vector_attributes:
+            value = Vector(value)
+        elif name.startswith("lock_"):
+            value = list(value)
+        object.__setattr__(self, name, value)
+
+    @property
+    def matrix_world(self):
+        # location, XYZ euler rotation and scale through the parent chain, constraints are not evaluated
+        (cx, cy, cz), (sx, sy, sz) = [[f(angle) for angle in self.rotation_euler] for f in (math.cos, math.sin)]
+        rotation = [
+            [cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz],
+            [cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz],
+            [-sy, sx * cy, cx * cy],
+        ]
+        matrix = [[rotation[i][j] * self.scale[j] for j in range(3)] + [self.location[i]] for i in range(3)]
+        matrix.append([0.0, 0.0, 0.0, 1.0])
+        if self.parent is None:
+            return matrix
+        parent = self.parent.matrix_world
+        return [[sum(parent[i][k] * matrix[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+    @property
+    def users_scene(self):
+        return tuple(scene for scene in bpy.data.scenes if any(obj is self for obj in scene.objects))
+
+    def is_visible(self, scene):
+        return not self.hide and any(a and b for a, b in zip(self.layers, scene.layers))
+
+    @recorded("Object.find_armature")
+    def find_armature(self):
+        parent = self.parent
+        while parent is not None:
+            if parent.type == 'ARMATURE':
+                return parent
+            parent = parent.parent
+        for modifier in self.modifiers:
+            if modifier.type == 'ARMATURE' and getattr(modifier, "object", None) is not None:
+                return modifier.object
+        return None
+
+    @recorded("Object.driver_add")
+    def driver_add(self, path, index=-1):
+        if self.animation_data is None:
+            self.animation_data = AnimData()
+        fcurve = FCurve(path, max(index, 0))
+        self.animation_data.drivers.append(fcurve)
+        return fcurve
+
+    @recorded("Object.driver_remove")
+    def driver_remove(self, path, index=-1):
+        if self.animation_data is None:
+            return False
+        drivers = self.animation_data.drivers
+        removed = [f for f in drivers if f.data_path == path and (index < 0 or f.array_index == index)]
+        for fcurve in removed:
+            list.remove(drivers, fcurve)
+        return bool(removed)
+
+    @recorded("Object.keyframe_insert")
+    def keyframe_insert(self, data_path, index=-1, frame=None):
+        return True
+
+class SceneObjects(PropCollection):
+    def __init__(self, scene):
+        super().__init__()
+        self.scene = scene
+        self.active = None
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self.find(key) >= 0
+        return key.scene_users > 0
+
+    @recorded("Scene.objects.link")
+    def link(self, obj):
+        if any(other is obj for other in self):
+            raise RuntimeError("Object '%s' already in scene" % obj.name)
+        obj.users += 1
+        obj.scene_users += 1
+        # like rna_Scene_object_link, the object is moved to the visible layers of the scene
+        obj.layers = list(self.scene.layers)
+        self.append(obj)
+
+    @recorded("Scene.objects.unlink")
+    def unlink(self, obj):
+        list.remove(self, obj)
+        obj.users -= 1
+        obj.scene_users -= 1
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = SceneObjects(self)
+        self.active_layer = 0
+        self.layers = [True] + [False] * 19
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+        self.unit_settings = Struct(system='NONE', scale_length=1.0, system_rotation='DEGREES', use_separate=False)
+        self.render = Struct(engine='BLENDER_RENDER', tile_x=64, tile_y=64, resolution_x=1920, resolution_y=1080, resolution_percentage=50, threads_mode='AUTO', threads=1)
+        self.cycles = Struct(device='CPU', feature_set='SUPPORTED', samples=128)
+
+    @recorded("Scene.update")
+    def update(self):
+        pass
+
+    @recorded("Scene.frame_set")
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = frame
+
+class SpaceView3D():
+    def __init__(self):
+        self.type = 'VIEW_3D'
+        self.use_occlude_geometry = True
+        self.lens = 35.0
+        self.region_3d = Struct(view_perspective='PERSP', is_perspective=True)
+
+class Area():
+    def __init__(self, type):
+        self.type = type
+        self.spaces = PropCollection([SpaceView3D()] if type == 'VIEW_3D' else [Struct(type=type)])
+        self.spaces.active = self.spaces[0]
+
+class Screen(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.areas = PropCollection([Area('VIEW_3D'), Area('PROPERTIES'), Area('OUTLINER'), Area('TIMELINE')])
+
+class Window():
+    def __init__(self, screen):
+        self.screen = screen
+
+class BlendData():
+    def __init__(self):
+        self.objects = BlendDataCollection("objects", Object)
+        self.meshes = BlendDataCollection("meshes", Mesh)
+        self.materials = BlendDataCollection("materials", Material)
+        self.armatures = BlendDataCollection("armatures", Armature)
+        self.images = BlendDataCollection("images", Image)
+        self.textures = BlendDataCollection("textures", Texture)
+        self.curves = BlendDataCollection("curves", TextCurve)
+        self.texts = BlendDataCollection("texts", Text)
+        self.scenes = BlendDataCollection("scenes", Scene)
+        self.screens = BlendDataCollection("screens", Screen)
+        self.filepath = ""
+
+# kept when files are loaded, as in blender
+user_preferences = Struct(edit=Struct(use_global_undo=True))
+
+class Context():
+    def __init__(self, data):
+        self.scene = data.scenes.new("Scene")
+        self.user_preferences = user_preferences
+        self.window = Window(None)
+        self.area = None
+        self.region = None
+
+    @property
+    def object(self):
+        return self.scene.objects.active
+
+    @property
+    def active_object(self):
+        return self.scene.objects.active
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.scene.objects if obj.select]
+
+    def copy(self):
+        return {"window": self.window, "screen": self.window.screen, "scene": self.scene, "area": self.area}
+
+# bpy.ops
+
+def link_new_object(name, data=None, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), layers=None):
+    obj = bpy.data.objects.new(name, data)
+    scene = bpy.context.scene
+    scene.objects.link(obj)
+    for other in scene.objects:
+        other.select = False
+    obj.select = True
+    obj.location = location
+    obj.rotation_euler = rotation
+    if layers is not None:
+        obj.layers = list(layers)
+    scene.objects.active = obj
+    return obj
+
+def op_object_empty_add(type='PLAIN_AXES', radius=1.0, view_align=False, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), layers=None):
+    obj = link_new_object("Empty", None, location, rotation, layers)
+    obj.empty_draw_type = type
+    obj.empty_draw_size = radius
+    return {'FINISHED'}
+
+def op_object_select_all(action='TOGGLE'):
+    for obj in bpy.context.scene.objects:
+        obj.select = action == 'SELECT' or (action == 'TOGGLE' and not obj.select)
+    return {'FINISHED'}
+
+def op_object_delete(use_global=False):
+    for obj in bpy.context.selected_objects:
+        bpy.data.objects.remove(obj, True)
+    bpy.context.scene.objects.active = None
+    return {'FINISHED'}
+
+def op_mesh_primitive_uv_sphere_add(segments=32, ring_count=16, size=1.0, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), layers=None):
+    mesh = bpy.data.meshes.new("Sphere")
+    mesh.vertices.add(segments * (ring_count - 1) + 2)
+    mesh.polygons.add(segments * ring_count)
+    link_new_object("Sphere", mesh, location, rotation, layers)
+    return {'FINISHED'}
+
+def op_mesh_make_wplane():
+    mesh = bpy.data.meshes.new("WPlane")
+    mesh.WPlane = Struct(size=[1.0, 1.0], subdivide=[1, 1], centered=True)
+    mesh.vertices.add(4)
+    mesh.polygons.add(1)
+    link_new_object("WPlane", mesh)
+    return {'FINISHED'}
+
+def op_screen_delete(override=None):
+    bpy.data.screens.remove(override["screen"])
+    return {'FINISHED'}
+
+def op_view3d_view_persportho(override=None):
+    for space in override["area"].spaces:
+        region_3d = space.region_3d
+        region_3d.view_perspective = 'ORTHO' if region_3d.view_perspective == 'PERSP' else 'PERSP'
+        region_3d.is_perspective = region_3d.view_perspective == 'PERSP'
+    return {'FINISHED'}
+
+def op_wm_save_as_mainfile(filepath="", copy=False):
+    with open(filepath, "wb") as f:
+        f.write(b"BLENDER-v279")
+    if not copy:
+        bpy.data.filepath = filepath
+    return {'FINISHED'}
+
+def op_wm_read_homefile(filepath="", load_ui=True):
+    reset()
+    return {'FINISHED'}
+
+operators = {
+    "object.empty_add": op_object_empty_add,
+    "object.select_all": op_object_select_all,
+    "object.delete": op_object_delete,
+    "mesh.primitive_uv_sphere_add": op_mesh_primitive_uv_sphere_add,
+    "mesh.make_wplane": op_mesh_make_wplane,
+    "screen.delete": op_screen_delete,
+    "view3d.view_persportho": op_view3d_view_persportho,
+    "wm.save_as_mainfile": op_wm_save_as_mainfile,
+    "wm.read_homefile": op_wm_read_homefile,
+}
+
+class BPyOpsSubModOp():
+    # 2.7x bpy/ops.py updates the scene before and after every operator call
+    @staticmethod
+    def _scene_update(context):
+        context.scene.update()
+
+class OpsSubmodule():
+    def __init__(self, module):
+        self.module = module
+
+    def __getattr__(self, name):
+        idname = self.module + "." + name
+        func = operators.get(idname, lambda *args, **kwargs: {'FINISHED'})
+
+        def call(*args, **kwargs):
+            BPyOpsSubModOp._scene_update(bpy.context)
+            result = func(*args, **kwargs)
+            if 'FINISHED' in result:
+                BPyOpsSubModOp._scene_update(bpy.context)
+            return result
+        return recorded("ops." + idname)(call)
+
+class Ops():
+    def __getattr__(self, module):
+        return OpsSubmodule(module)
+
+# bmesh
+
+class BMVertSeq(list):
+    @recorded("bmesh.verts.new")
+    def new(self, co=(0.0, 0.0, 0.0)):
+        vert = Struct(co=Vector(co))
+        self.append(vert)
+        return vert
+
+class BMesh():
+    def __init__(self):
+        self.verts = BMVertSeq()
+        self.faces = []
+
+    @recorded("bmesh.to_mesh")
+    def to_mesh(self, mesh):
+        mesh.vertices.add(len(self.verts) - len(mesh.vertices))
+        mesh.vertices.foreach_set("co", [c for vert in self.verts for c in vert.co])
+        mesh.polygons.add(len(self.faces) - len(mesh.polygons))
+
+    def free(self):
+        self.verts = BMVertSeq()
+        self.faces = []
+
+@recorded("bmesh.ops.create_uvsphere")
+def bmesh_ops_create_uvsphere(bm, u_segments=32, v_segments=16, diameter=1.0, matrix=None, calc_uvs=False):
+    for i in range(u_segments * (v_segments - 1) + 2):
+        bm.verts.new()
+    bm.faces.extend([None] * (u_segments * v_segments))
+    return {"verts": list(bm.verts)}
+
+@recorded("bpy_extras.object_utils.object_data_add")
+def object_data_add(context, obdata, operator=None, name=None):
+    return link_new_object(name or obdata.name, obdata)
+
+# modules
+
+bpy = types.ModuleType("bpy")
+bpy_ops_module = types.ModuleType("bpy.ops")
+bpy_ops_module.BPyOpsSubModOp = BPyOpsSubModOp
+bpy.ops = Ops()
+bpy.types = types.ModuleType("bpy.types")
+bpy.app = Struct(version=(2, 79, 0), background=True, binary_path="blender")
+bpy.utils = types.ModuleType("bpy.utils")
+bpy.props = types.ModuleType("bpy.props")
+bpy.path = types.ModuleType("bpy.path")
+bpy.path.abspath = lambda path, start=None, library=None: (
+    os.path.join(start or os.path.dirname(bpy.data.filepath), path[2:]) if path.startswith("//") else path)
+
+bmesh = types.ModuleType("bmesh")
+bmesh.new = recorded("bmesh.new")(BMesh)
+bmesh.ops = types.ModuleType("bmesh.ops")
+bmesh.ops.create_uvsphere = bmesh_ops_create_uvsphere
+
+bpy_extras = types.ModuleType("bpy_extras")
+object_utils = types.ModuleType("bpy_extras.object_utils")
+object_utils.object_data_add = object_data_add
+bpy_extras.object_utils = object_utils
+
+for cls in (Object, Mesh, Material, Texture, Armature, Image, Text, Scene, Screen, Constraint, Modifier, FCurve, Driver):
+    setattr(bpy.types, cls.__name__, cls)
+
+def reset():
+    bpy.data = BlendData()
+    bpy.context = Context(bpy.data)
+
+    for name in ("Default", "3D View Full", "Animation", "Game Logic", "Motion Tracking", "Video Editing"):
+        bpy.data.screens.new(name)
+    bpy.context.window.screen = bpy.data.screens["Default"]
+
+    scene = bpy.context.scene
+    for name in ("Camera", "Cube", "Lamp"):
+        data = bpy.data.meshes.new(name) if name == "Cube" else None
+        scene.objects.link(bpy.data.objects.new(name, data))
+
+    recorder.reset()
+
+def install():
+    modules = {
+        "bpy": bpy,
+        "bpy.ops": bpy_ops_module,
+        "bpy.types": bpy.types,
+        "bpy.utils": bpy.utils,
+        "bpy.props": bpy.props,
+        "bpy.path": bpy.path,
+        "bmesh": bmesh,
+        "bmesh.ops": bmesh.ops,
+        "bpy_extras": bpy_extras,
+        "bpy_extras.object_utils": object_utils,
+    }
+    sys.modules.update(modules)
+    reset()
+
+reset()
@@ -0,0 +1,386 @@
+import argparse
+import importlib.util
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+if "--profile" in sys.argv:
+    os.environ["BLENDER_SCRIPTS_PROFILE"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_bpy
+
+fake_bpy.install()
+
+from fake_bpy import bpy
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, script_dir)
+
+import profiling
+
+modules = {}
+
+def load_script(name):
+    if name not in modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(script_dir, name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+        modules[name] = module
+    return modules[name]
+
+def select(objects, active):
+    for obj in bpy.context.scene.objects:
+        obj.select = False
+    for obj in objects:
+        obj.select = True
+    bpy.context.scene.objects.active = active
+
+def link(name, data=None, location=(0.0, 0.0, 0.0)):
+    obj = bpy.data.objects.new(name, data)
+    obj.location = location
+    bpy.context.scene.objects.link(obj)
+    return obj
+
+# scenarios: setup(size) prepares the fake scene and returns the callable that is timed
+
+def setup_fibo(size):
+    fibo = load_script("fibo")
+    return lambda: fibo.create_spiral_mesh(size)
+
+def setup_pmx_materials(size):
+    module = load_script("create_pmx_materials")
+
+    arm = link("Armature", bpy.data.armatures.new("Armature"))
+    materials = [bpy.data.materials.new("material") for i in range(max(size // 10, 1))]
+    for i in range(size):
+        mesh = bpy.data.meshes.new("mesh")
+        for j in range(3):
+            mesh.materials.append(materials[(i + j) % len(materials)])
+        link("mesh", mesh).parent = arm
+    select([arm], arm)
+    fake_bpy.recorder.reset()
+
+    return lambda: module.CreatePMXMaterials().execute()
+
+def setup_pmx_materials_all(size):
+    module = load_script("create_pmx_materials")
+
+    materials = [bpy.data.materials.new("material") for i in range(size)]
+    for i in range(size):
+        arm = link("Armature", bpy.data.armatures.new("Armature"))
+        for j in range(10):
+            mesh = bpy.data.meshes.new("mesh")
+            mesh.materials.append(materials[(i + j) % len(materials)])
+            link("mesh", mesh).parent = arm
+    fake_bpy.recorder.reset()
+
+    return lambda: module.CreatePMXMaterials.execute_all()
+
+def setup_circular_array(size):
+    module = load_script("create_circular_array")
+
+    objects = [link("ornament", bpy.data.meshes.new("ornament"), (1.0, 0.0, 0.0)) for i in range(size)]
+    select(objects, objects[0])
+    fake_bpy.recorder.reset()
+
+    return lambda: module.CircularArray().execute()
+
+def setup_circular_array_batch(size):
+    module = load_script("create_circular_array")
+
+    objects = [link("ornament", bpy.data.meshes.new("ornament"), (1.0, 0.0, 0.0)) for i in range(size)]
+    fake_bpy.recorder.reset()
+
+    return lambda: module.CircularArray.execute_batch(objects)
+
+def setup_circular_array_realize(size):
+    module = load_script("create_circular_array")
+
+    # an ornament of `size` quads in 36 copies
+    mesh = bpy.data.meshes.new("ornament")
+    mesh.vertices.add(size * 4)
+    mesh.vertices.foreach_set("co", np.random.RandomState(0).uniform(0.5, 1.0, size * 12).astype(np.float32))
+    mesh.loops.add(size * 4)
+    mesh.loops.foreach_set("vertex_index", np.arange(size * 4, dtype=np.int32))
+    mesh.polygons.add(size)
+    mesh.polygons.foreach_set("loop_start", np.arange(0, size * 4, 4, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(size, 4, dtype=np.int32))
+    obj = link("ornament", mesh)
+    pivot_empty = link("pivot_empty")
+    pivot_empty.rotation_euler = (0.0, 0.0, math.radians(10))
+    array_modifier = obj.modifiers.new("Array", type='ARRAY')
+    array_modifier.use_relative_offset = False
+    array_modifier.use_object_offset = True
+    array_modifier.offset_object = pivot_empty
+    array_modifier.count = 36
+    fake_bpy.recorder.reset()
+
+    return lambda: module.CircularArray.realize([obj])
+
+def setup_record_shelf(size):
+    module = load_script("create_record_shelf")
+
+    def run():
+        record_data = module.Record().create_data()
+        objects = len(bpy.data.objects)
+        shelves = 0
+        while len(bpy.data.objects) - objects - shelves < size:
+            shelf = module.Shelf()
+            shelf.create(record_data, shelf.create_layout(shelves))
+            shelves += 1
+
+    return run
+
+def setup_record_shelf_instanced(size):
+    module = load_script("create_record_shelf")
+
+    def run():
+        records = 0
+        shelves = 0
+        while records < size:
+            shelf = module.Shelf()
+            layout = shelf.create_layout(shelves)
+            shelf.create_instanced(layout)
+            records += len(layout)
+            shelves += 1
+
+    return run
+
+def setup_record_shelf_layouts(size):
+    module = load_script("record_shelf_layout")
+    return lambda: module.create_layouts(range(size), max_workers=1)
+
+def setup_rgb_morph_file(size):
+    module = load_script("create_rgb_morph_file")
+
+    def run():
+        for i in range(size):
+            module.CreateRGBMorphFile().execute()
+
+    return run
+
+def setup_rgb_morph_file_materials(size):
+    module = load_script("create_rgb_morph_file")
+
+    spec = dict(module.CreateRGBMorphFile.default_spec, materials=["material%d" % i for i in range(size)])
+    return lambda: module.CreateRGBMorphFile(spec).execute()
+
+def create_offset_dict(material_name, index):
+    # offsets as built before MaterialOffset, for comparison
+    offset = {}
+    offset["material_name"] = material_name
+    offset["offset_type"] = 1
+    offset["diffuse"] = [0,0,0,0]
+    offset["specular"] = [0,0,0]
+    offset["power"] = 0
+    offset["ambient"] = [0,0,0]
+    offset["edge_size"] = 0
+    offset["edge_color"] = [0,0,0,0]
+    offset["texture"] = [0,0,0,0]
+    offset["sphere"] = [0,0,0,0]
+    offset["toon"] = [0,0,0,0]
+    offset["diffuse"][index] = -1
+    offset["ambient"][index] = -1
+    return offset
+
+def setup_rgb_morph_offsets_dict(size):
+    return lambda: [create_offset_dict("material", i % 3) for i in range(size)]
+
+def setup_rgb_morph_offsets(size):
+    module = load_script("create_rgb_morph_file")
+
+    creator = module.CreateRGBMorphFile()
+    return lambda: [creator.create_offset("material", i % 3) for i in range(size)]
+
+def setup_image_index(size):
+    module = load_script("image_index")
+
+    # 64 KiB files, every content in two files
+    directory = os.path.join(tempfile.gettempdir(), "blender_scripts_benchmark_images_%d" % size)
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, "texture%d.png" % i) for i in range(size)]
+    for i, path in enumerate(paths):
+        if not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(np.random.RandomState(i // 2).bytes(65536))
+
+    return lambda: module.find_duplicates(paths)
+
+def setup_setting_pmx(size):
+    module = load_script("setting_pmx")
+
+    for i in range(size):
+        link("object", bpy.data.meshes.new("object"))
+    fake_bpy.recorder.reset()
+
+    return lambda: module.SettingPMX().execute()
+
+def write_dot(size):
+    # a labelled random graph with 2 edges per node
+    file_path = os.path.join(tempfile.gettempdir(), "blender_scripts_benchmark_%d.dot" % size)
+    if not os.path.exists(file_path):
+        rng = random.Random(size)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write("graph g{\n")
+            for i in range(size):
+                f.write('  n%d[label="節点%d"];\n' % (i, i))
+            for i in range(size * 2):
+                f.write('  n%d -- n%d[label="辺%d"];\n' % (rng.randrange(size), rng.randrange(size), i % 10))
+            f.write("}\n")
+    return file_path
+
+def setup_dot_graph_parse(size):
+    module = load_script("dot_graph")
+
+    file_path = write_dot(size)
+    return lambda: module.load(file_path)
+
+def setup_create_dot_graph(size):
+    module = load_script("create_dot_graph")
+
+    file_path = write_dot(size)
+    return lambda: module.CreateDotGraph(file_path, layout="grid").execute()
+
+def get_random_edges(size):
+    return np.random.RandomState(size).randint(0, size, (size * 2, 2))
+
+def setup_graph_layout(size):
+    module = load_script("graph_layout")
+
+    edges = get_random_edges(size)
+    return lambda: module.force_layout(edges, size, iterations=20, seed=0)
+
+def setup_graph_layout_exact(size):
+    module = load_script("graph_layout")
+
+    edges = get_random_edges(size)
+    return lambda: module.force_layout(edges, size, iterations=20, seed=0, method="exact")
+
+scenarios = [
+    ("fibo", "fibo", "points", (10, 1000, 100000), setup_fibo),
+    ("create_pmx_materials", "create_pmx_materials", "objects", (10, 1000), setup_pmx_materials),
+    ("create_pmx_materials_all", "create_pmx_materials", "armatures", (10, 100), setup_pmx_materials_all),
+    ("create_circular_array", "create_circular_array", "selected", (1, 100), setup_circular_array),
+    ("create_circular_array_batch", "create_circular_array", "rigs", (10, 1000), setup_circular_array_batch),
+    ("circular_array_realize", "create_circular_array", "faces", (10, 10000), setup_circular_array_realize),
+    ("create_record_shelf", "create_record_shelf", "records", (10, 10000), setup_record_shelf),
+    ("create_record_shelf_instanced", "create_record_shelf", "records", (10, 10000), setup_record_shelf_instanced),
+    ("record_shelf_layout", "record_shelf_layout", "shelves", (10, 10000), setup_record_shelf_layouts),
+    ("create_rgb_morph_file", "create_rgb_morph_file", "runs", (1, 100), setup_rgb_morph_file),
+    ("create_rgb_morph_file_materials", "create_rgb_morph_file", "materials", (10, 10000), setup_rgb_morph_file_materials),
+    ("rgb_morph_offsets_dict", "create_rgb_morph_file", "offsets", (10000, 100000), setup_rgb_morph_offsets_dict),
+    ("rgb_morph_offsets", "create_rgb_morph_file", "offsets", (10000, 100000), setup_rgb_morph_offsets),
+    ("image_index", "image_index", "files", (10, 1000), setup_image_index),
+    ("setting_pmx", "setting_pmx", "objects", (10, 1000), setup_setting_pmx),
+    ("dot_graph_parse", "dot_graph", "nodes", (100, 10000), setup_dot_graph_parse),
+    ("create_dot_graph", "create_dot_graph", "nodes", (100, 10000), setup_create_dot_graph),
+    ("graph_layout", "graph_layout", "nodes", (100, 1000, 10000), setup_graph_layout),
+    ("graph_layout_exact", "graph_layout", "nodes", (100, 1000), setup_graph_layout_exact),
+]
+
+def run_scenario(scenario, script, param, size, setup, repeat, memory=False):
+    times = []
+    calls = None
+    peak_memory = None
+    for i in range(repeat):
+        profiling.reset()
+        fake_bpy.reset()
+        func = setup(size)
+        fake_bpy.recorder.reset()
+
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+        calls = fake_bpy.recorder.report()
+        steps = {name: stat._asdict() for name, stat in profiling.get_stats().items()}
+
+    if memory:
+        # separate traced run, tracemalloc distorts the timing
+        fake_bpy.reset()
+        func = setup(size)
+        tracemalloc.start()
+        result = func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+
+    return {
+        "name": "%s[%s=%d]" % (scenario, param, size),
+        "script": script,
+        "params": {param: size},
+        "wall_time": min(times),
+        "wall_time_mean": sum(times) / len(times),
+        "repeat": repeat,
+        "peak_memory": peak_memory,
+        "calls": calls,
+        "steps": steps,
+    }
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+
+    print("%-48s %12s %12s %8s" % ("scenario", "baseline", "current", "ratio"))
+    for result in results:
+        base = baseline.get(result["name"])
+        if base is None:
+            print("%-48s %12s %12.6f %8s" % (result["name"], "-", result["wall_time"], "-"))
+            continue
+        ratio = result["wall_time"] / base["wall_time"] if base["wall_time"] else float("inf")
+        print("%-48s %12.6f %12.6f %8.2f" % (result["name"], base["wall_time"], result["wall_time"], ratio))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Blender scripts against an in-process fake bpy.")
+    parser.add_argument("-k", "--scenario", default="", help="only run scenarios whose name contains this string")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="runs per scenario, the fastest is reported")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("-b", "--baseline", help="JSON report of a previous run to compare against")
+    parser.add_argument("-m", "--memory", action="store_true", help="also record the peak traced memory of each scenario")
+    parser.add_argument("--profile", action="store_true", help="enable the profiling module and report per-step statistics")
+    parser.add_argument("--log-level", default="WARNING", help="level of the script loggers during the run")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scenario, script, param, sizes, setup in scenarios:
+        for size in sizes:
+            name = "%s[%s=%d]" % (scenario, param, size)
+            if args.scenario not in name:
+                continue
+            load_script(script)
+            for logger in logging.Logger.manager.loggerDict.values():
+                if isinstance(logger, logging.Logger):
+                    logger.setLevel(args.log_level)
+            results.append(run_scenario(scenario, script, param, size, setup, args.repeat, args.memory))
+            print("%-48s %12.6f s" % (name, results[-1]["wall_time"]), file=sys.stderr)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import bpy
+import sys
+
+# Context for scripts that make many scene changes in a row.
+#
+# While it is active global undo is off and scene updates are deferred: the ones bpy.ops runs before and after
+# every operator call (BPyOpsSubModOp._scene_update in bpy/ops.py) and the ones requested with update().
+# On exit the scene is updated once, the selection and the active object are restored and the number of
+# deferred updates is logged. A nested context joins the outermost one.
+
+class BulkEditContext():
+    active = None
+
+    def __init__(self, logger=None, restore_selection=True):
+        self.logger = logger
+        self.restore_selection = restore_selection
+        self.deferred = 0
+        self.outer = None
+        self.use_global_undo = None
+        self.op_class = None
+        self.scene_update = None
+        self.selected_names = None
+        self.active_name = None
+
+    def __enter__(self):
+        if BulkEditContext.active is not None:
+            self.outer = BulkEditContext.active
+            return self.outer
+        BulkEditContext.active = self
+
+        edit = bpy.context.user_preferences.edit
+        self.use_global_undo = edit.use_global_undo
+        edit.use_global_undo = False
+
+        self.op_class = getattr(sys.modules.get("bpy.ops"), "BPyOpsSubModOp", None)
+        if self.op_class is not None:
+            self.scene_update = self.op_class.__dict__["_scene_update"]
+            self.op_class._scene_update = staticmethod(defer_update)
+
+        if self.restore_selection:
+            objects = bpy.context.scene.objects
+            self.selected_names = {obj.name for obj in objects if obj.select}
+            self.active_name = objects.active.name if objects.active is not None else None
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is not None:
+            return
+
+        BulkEditContext.active = None
+        if self.op_class is not None:
+            self.op_class._scene_update = self.scene_update
+        bpy.context.user_preferences.edit.use_global_undo = self.use_global_undo
+
+        scene = bpy.context.scene
+        scene.update()
+
+        if self.restore_selection:
+            for obj in scene.objects:
+                select = obj.name in self.selected_names
+                if obj.select != select:
+                    obj.select = select
+            scene.objects.active = scene.objects.get(self.active_name) if self.active_name is not None else None
+
+        if self.logger is not None:
+            self.logger.info("%d scene updates deferred to one", self.deferred)
+
+def defer_update(context=None):
+    BulkEditContext.active.deferred += 1
+
+def update():
+    # scene.update(), deferred to the end of the active BulkEditContext
+    if BulkEditContext.active is None:
+        bpy.context.scene.update()
+    else:
+        defer_update()
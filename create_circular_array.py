@@ -1,42 +1,17 @@
 import bpy
-import io
-import logging
+import bulk_edit
 import math
 import numpy as np
+import profiling
+import text_logging
 
-logger = logging.getLogger("circular_array")
+logger = text_logging.get_logger("circular_array")
 
-if not logger.handlers:
-    hdlr = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-    hdlr.setFormatter(formatter)
-    logger.addHandler(hdlr)
-    logger.setLevel(logging.DEBUG) # DEBUG, INFO, WARNING, ERROR, CRITICAL
-
-logger.debug("init logger") # debug, info, warning, error, critical
-
-class LoggingToTextContext():
-    def __init__(self, logger):
-        self.logger = logger
-        self.stream = io.StringIO()
-        self.handler = logging.StreamHandler(self.stream)
-        formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-        self.handler.setFormatter(formatter)
-        self.handler.setLevel(logging.INFO)
-        self.logger.addHandler(self.handler)
-
-    def __enter__(self):
-        return None
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        log_file_name = "log"
-        texts = bpy.data.texts
-        text = texts[log_file_name] if log_file_name in texts else texts.new(log_file_name)
-        text.clear()
-        text.write(self.stream.getvalue())
-
-        self.logger.removeHandler(self.handler)
-        self.stream.close()
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+multi_rig = False # True: one rig per selected object
+driver_mode = "driver" # "driver": python drivers, "simple": drivers without python and a fixed array count, "bake": plain values
+bake_frames = None # e.g. range(1, 251): bake keyframes per frame instead of a single value
+realize = False # True: write the selected rigged objects with all their array copies into one mesh, e.g. for pmx export
 
 class CircularArray():
     selected_object = None
@@ -47,26 +22,65 @@ class CircularArray():
 
     index_axis_dict = {0: "x", 1: "y", 2: "z"}
     axis_index_dict = {v:k for k, v in index_axis_dict.items()}
+    lock_axis_dict = {axis: tuple(i != index for i in range(3)) for axis, index in axis_index_dict.items()}
 
-    def __init__(self):
+    def __init__(self, driver_mode="driver", bake_frames=None):
         logger.info("start")
 
+        self.driver_mode = driver_mode
+        self.bake_frames = bake_frames
+        self.array_modifiers = []
         self.size = 0.01
         self.axis = "z"
         self.obj_axis = "x"
         self.rotation_axis = "x"
         self.angle = 60.0
         self.layers = self.create_layers(0)
+        self.empties = []
 
         logger.info("end")
 
+    @profiling.step
     def execute(self):
         logger.info("start")
 
-        self.get_layers()
-        self.get_selected_object()
-        if not self.selected_object:
-            return
+        with bulk_edit.BulkEditContext(logger):
+            self.get_layers()
+            self.get_selected_object()
+            if not self.selected_object:
+                return
+            self.build()
+            bulk_edit.update()
+
+        logger.info("end")
+
+    @classmethod
+    @profiling.step
+    def execute_batch(cls, objects, driver_mode="driver", bake_frames=None):
+        logger.info("start")
+
+        rigs = []
+        layers = None
+        with bulk_edit.BulkEditContext(logger):
+            for obj in objects:
+                rig = cls(driver_mode, bake_frames)
+                if layers is None:
+                    rig.get_layers()
+                    layers = rig.layers
+                else:
+                    rig.layers = layers
+                rig.set_selected_object(obj, [obj])
+                rig.build()
+                rigs.append(rig)
+
+            bulk_edit.update()
+
+        logger.info("end")
+
+        return rigs
+
+    @profiling.step
+    def build(self):
         self.get_view_axis()
         self.get_axis()
         self.get_rotation_axis()
@@ -76,26 +90,33 @@ class CircularArray():
         self.add_object_empty()
         self.add_rotation_empty()
         self.add_pivot_empty()
+        self.link_empties()
         self.add_constratint()
+        if self.driver_mode == "bake":
+            self.bake()
 
-        logger.info("end")
-
+    @profiling.step
     def get_layers(self):
         active_layer_index = bpy.context.scene.active_layer
 
         layer_index = (active_layer_index + 10) % 20
         self.layers = self.create_layers(layer_index)
 
+    @profiling.step
     def get_selected_object(self):
         logger.info("start")
         if not bpy.context.object:
             return
-        self.selected_object = bpy.context.object
-        self.selected_objects = bpy.context.selected_objects
-        self.selected_object_location = self.selected_object.location.copy()
+        self.set_selected_object(bpy.context.object, bpy.context.selected_objects)
 
         logger.info("end")
 
+    def set_selected_object(self, obj, objects):
+        self.selected_object = obj
+        self.selected_objects = objects
+        self.selected_object_location = obj.location.copy()
+
+    @profiling.step
     def get_view_axis(self):
         lock_location = self.selected_object.lock_location
         if lock_location[0] == True:
@@ -107,6 +128,7 @@ class CircularArray():
 
         logger.debug(self.axis)
 
+    @profiling.step
     def get_axis(self):
         loc_array = [self.selected_object_location.x, self.selected_object_location.y, self.selected_object_location.z]
         max_index = np.argmax(loc_array)
@@ -114,6 +136,7 @@ class CircularArray():
 
         self.obj_axis = self.index_axis_dict[max_index]
 
+    @profiling.step
     def get_rotation_axis(self):
         exclusion_list = [self.axis, self.obj_axis]
 
@@ -124,25 +147,22 @@ class CircularArray():
         else:
             self.rotation_axis = "z"
 
+    @profiling.step
     def set_lock(self):
         for selected_object in self.selected_objects:
             selected_object.lock_location = (True, True, True)
             selected_object.lock_rotation = (True, True, True)
             selected_object.lock_scale = (True, True, True)
 
+    @profiling.step
     def add_base_empty(self):
-        bpy.ops.object.empty_add(type='SPHERE', location=(0.0,0.0,0.0), radius=self.size, layers=self.layers)
-        self.base_empty = bpy.context.object
-        self.base_empty.name = "base_empty"
-        self.base_empty.show_x_ray = True
+        self.base_empty = self.new_empty("base_empty", 'SPHERE', self.size)
 
+    @profiling.step
     def add_handle_empty(self):
         rotation = self.get_rotation()
 
-        bpy.ops.object.empty_add(type='CIRCLE', location=(0.0,0.0,0.0), radius=self.size*2, rotation=rotation, layers=self.layers)
-        self.handle_empty = bpy.context.object
-        self.handle_empty.name = "handle_empty"
-        self.handle_empty.show_x_ray = True
+        self.handle_empty = self.new_empty("handle_empty", 'CIRCLE', self.size*2, rotation=rotation)
 
         self.handle_empty.lock_location = (True, True, True)
         self.handle_empty.lock_rotation = self.get_lock_rotation()
@@ -153,11 +173,9 @@ class CircularArray():
         child_of_const = self.handle_empty.constraints.new(type='CHILD_OF')
         child_of_const.target = self.base_empty
 
+    @profiling.step
     def add_object_empty(self):
-        bpy.ops.object.empty_add(type='SPHERE', radius=self.size, location=self.selected_object_location, layers=self.layers)
-        self.object_empty = bpy.context.object
-        self.object_empty.name = "object_empty"
-        self.object_empty.show_x_ray = True
+        self.object_empty = self.new_empty("object_empty", 'SPHERE', self.size, location=self.selected_object_location)
 
         self.object_empty.lock_location = self.get_lock_location()
         self.object_empty.lock_rotation = (True, True, True)
@@ -168,11 +186,9 @@ class CircularArray():
         child_of_const = self.object_empty.constraints.new(type='CHILD_OF')
         child_of_const.target = self.base_empty
 
+    @profiling.step
     def add_rotation_empty(self):
-        bpy.ops.object.empty_add(type='CIRCLE', radius=self.size*2, location=(0.0,0.0,0.0), layers=self.layers)
-        self.rotation_empty = bpy.context.object
-        self.rotation_empty.name = "rotation_empty"
-        self.rotation_empty.show_x_ray = True
+        self.rotation_empty = self.new_empty("rotation_empty", 'CIRCLE', self.size*2)
 
         self.rotation_empty.lock_location = (True, True, True)
         self.rotation_empty.lock_rotation = self.get_lock(self.rotation_axis)
@@ -183,11 +199,9 @@ class CircularArray():
         child_of_const = self.rotation_empty.constraints.new(type='CHILD_OF')
         child_of_const.target = self.object_empty
 
+    @profiling.step
     def add_pivot_empty(self):
-        bpy.ops.object.empty_add(type='PLAIN_AXES', radius=self.size, location=self.selected_object_location, layers=self.layers)
-        self.pivot_empty = bpy.context.object
-        self.pivot_empty.name = "pivot_empty"
-        self.pivot_empty.show_x_ray = True
+        self.pivot_empty = self.new_empty("pivot_empty", 'PLAIN_AXES', self.size, location=self.selected_object_location)
         # self.pivot_empty.hide_select = True
 
         self.pivot_empty.lock_location = (True, True, True)
@@ -199,8 +213,28 @@ class CircularArray():
         child_of_const = self.pivot_empty.constraints.new(type='CHILD_OF')
         child_of_const.target = self.handle_empty
 
-        self.add_location_driver()
-        self.add_rotation_driver()
+        if self.driver_mode != "bake":
+            self.add_location_driver()
+            self.add_rotation_driver()
+
+    def new_empty(self, name, draw_type, draw_size, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0)):
+        empty = bpy.data.objects.new(name, None)
+        empty.empty_draw_type = draw_type
+        empty.empty_draw_size = draw_size
+        empty.location = location
+        empty.rotation_euler = rotation
+        empty.show_x_ray = True
+
+        self.empties.append(empty)
+        return empty
+
+    @profiling.step
+    def link_empties(self):
+        scene = bpy.context.scene
+        for empty in self.empties:
+            scene.objects.link(empty)
+            # link() puts the object on the visible layers of the scene
+            empty.layers = self.layers
 
     def add_location_driver(self):
         fcurve = self.pivot_empty.driver_add("location", self.get_location_index())
@@ -209,7 +243,7 @@ class CircularArray():
         driver_target = driver_value.targets.values()[0]
         driver_target.id = self.object_empty
         driver_target.data_path = "location[" + str(self.get_location_index())  + "]"
-        driver.expression = driver_value.name
+        self.set_copy_expression(driver, driver_value)
 
     def add_rotation_driver(self):
         fcurve = self.pivot_empty.driver_add("rotation_euler", self.axis_index_dict[self.rotation_axis])
@@ -218,8 +252,16 @@ class CircularArray():
         driver_target = driver_value.targets.values()[0]
         driver_target.id = self.rotation_empty
         driver_target.data_path = "rotation_euler[" + str(self.axis_index_dict[self.rotation_axis])  + "]"
-        driver.expression = driver_value.name
+        self.set_copy_expression(driver, driver_value)
 
+    def set_copy_expression(self, driver, driver_value):
+        if self.driver_mode == "simple":
+            # averaged single variable, evaluated without python
+            driver.type = 'AVERAGE'
+        else:
+            driver.expression = driver_value.name
+
+    @profiling.step
     def add_constratint(self):
         # self.select_object(self.selected_object)
 
@@ -236,8 +278,15 @@ class CircularArray():
             array_modifier.relative_offset_displace = (0.0, 0.0, 0.0)
             array_modifier.use_object_offset = True
             array_modifier.offset_object = self.pivot_empty
+            self.array_modifiers.append((selected_object, array_modifier))
+
+            if self.driver_mode == "driver":
+                self.add_array_driver(selected_object, array_modifier)
 
-            self.add_array_driver(selected_object, array_modifier)
+        if self.driver_mode == "simple":
+            # the count needs round(), i.e. a scripted python driver in 2.7x, so it is set once
+            logger.warning("array count is not driven in simple mode, it does not follow handle_empty")
+            self.bake_count()
 
     def add_array_driver(self, obj, array_modifier):
         fcurve = obj.driver_add("modifiers[\"" + array_modifier.name + "\"].count")
@@ -249,6 +298,49 @@ class CircularArray():
         # driver.expression = "2*pi/" + driver_value.name
         driver.expression = "round(2*pi/" + driver_value.name + ")"
 
+    @profiling.step
+    def bake(self):
+        if self.bake_frames is None:
+            self.bake_values()
+            return
+
+        scene = bpy.context.scene
+        frame_current = scene.frame_current
+        for frame in self.bake_frames:
+            scene.frame_set(frame)
+            self.bake_values(frame)
+        scene.frame_set(frame_current)
+
+    def bake_values(self, frame=None):
+        location_index = self.get_location_index()
+        rotation_index = self.axis_index_dict[self.rotation_axis]
+
+        self.pivot_empty.location[location_index] = self.object_empty.location[location_index]
+        self.pivot_empty.rotation_euler[rotation_index] = self.rotation_empty.rotation_euler[rotation_index]
+
+        self.bake_count()
+
+        if frame is not None:
+            for obj, array_modifier in self.array_modifiers:
+                obj.keyframe_insert("modifiers[\"" + array_modifier.name + "\"].count", frame=frame)
+            self.pivot_empty.keyframe_insert("location", index=location_index, frame=frame)
+            self.pivot_empty.keyframe_insert("rotation_euler", index=rotation_index, frame=frame)
+
+    def bake_count(self):
+        count = self.get_array_count()
+        if count is None:
+            return
+        for obj, array_modifier in self.array_modifiers:
+            array_modifier.count = count
+
+    def get_array_count(self):
+        angle = self.handle_empty.rotation_euler[self.get_axis_index()]
+        if angle == 0.0:
+            logger.warning("handle_empty rotation is 0")
+            return None
+
+        return round(2*math.pi/angle)
+
     def create_layers(self, layer_number):
         layers = [False] * 20
         layers[layer_number] = True
@@ -263,41 +355,147 @@ class CircularArray():
             return (0.0, 0.0, math.radians(self.angle))
 
     def get_lock_rotation(self):
-        if self.axis == "x":
-            return (False, True, True)
-        elif self.axis == "y":
-            return (True, False, True)
-        else:
-            return (True, True, False)
+        return self.lock_axis_dict[self.axis]
 
     def get_lock_location(self):
-        if self.obj_axis == "x":
-            return (False, True, True)
-        elif self.obj_axis == "y":
-            return (True, False, True)
-        else:
-            return (True, True, False)
+        return self.lock_axis_dict[self.obj_axis]
 
     def get_lock(self, axis):
-        lock = [True, True, True]
-        lock[self.axis_index_dict[axis]] = False
-        return tuple(lock)
+        return self.lock_axis_dict[axis]
 
     def get_axis_index(self):
-        if self.axis == "x":
-            return 0
-        elif self.axis == "y":
-            return 1
-        else:
-            return 2
+        return self.axis_index_dict[self.axis]
 
     def get_location_index(self):
-        if self.obj_axis == "x":
-            return 0
-        elif self.obj_axis == "y":
-            return 1
-        else:
-            return 2
+        return self.axis_index_dict[self.obj_axis]
+
+    @classmethod
+    @profiling.step
+    def realize(cls, objects, name="circular_array"):
+        # the array copies as the modifier builds them: copy k is transformed by offset^k in object space,
+        # offset = matrix_world^-1 * offset_object.matrix_world
+        logger.info("start")
+
+        parts = [(obj.data, cls.get_instance_matrices(obj)) for obj in objects if obj.type == 'MESH']
+        mesh = cls.create_realized_mesh(parts, name)
+
+        obj = bpy.data.objects.new(name, mesh)
+        bpy.context.scene.objects.link(obj)
+        logger.info("%s: %d copies, %d vertices", name, sum(len(matrices) for data, matrices in parts), len(mesh.vertices))
+
+        logger.info("end")
+
+        return obj
+
+    @staticmethod
+    def get_instance_matrices(obj):
+        # (count, 4, 4) world matrices of the copies
+        matrix_world = np.array(obj.matrix_world, dtype=np.float64)
+        array_modifier = None
+        for modifier in obj.modifiers:
+            if modifier.type == 'ARRAY' and modifier.use_object_offset and modifier.offset_object is not None:
+                array_modifier = modifier
+                break
+        if array_modifier is None:
+            return matrix_world[np.newaxis]
+        if array_modifier.use_relative_offset:
+            logger.warning("%s: relative offset is ignored", obj.name)
+
+        offset = np.linalg.inv(matrix_world) @ np.array(array_modifier.offset_object.matrix_world, dtype=np.float64)
+
+        # powers of offset by doubling, one batched matmul per step
+        powers = np.identity(4)[np.newaxis]
+        step = offset
+        while len(powers) < array_modifier.count:
+            powers = np.concatenate((powers, powers @ step))
+            step = step @ step
+
+        return matrix_world @ powers[:array_modifier.count]
+
+    @staticmethod
+    def get_mesh_arrays(mesh):
+        arrays = {}
+        for collection, attr, dtype, width in (
+                (mesh.vertices, "co", np.float32, 3),
+                (mesh.loops, "vertex_index", np.int32, 1),
+                (mesh.polygons, "loop_start", np.int32, 1),
+                (mesh.polygons, "loop_total", np.int32, 1),
+                (mesh.polygons, "material_index", np.int32, 1),
+                (mesh.polygons, "use_smooth", np.bool_, 1)):
+            values = np.empty(len(collection) * width, dtype=dtype)
+            collection.foreach_get(attr, values)
+            arrays[attr] = values
+
+        arrays["co"] = arrays["co"].reshape(-1, 3)
+        if mesh.uv_layers.active is not None:
+            uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+            mesh.uv_layers.active.data.foreach_get("uv", uv)
+            arrays["uv"] = uv.reshape(-1, 2)
+
+        return arrays
+
+    @classmethod
+    @profiling.step
+    def create_realized_mesh(cls, parts, name):
+        materials = []
+        co = []
+        vertex_index = []
+        loop_start = []
+        loop_total = []
+        material_index = []
+        use_smooth = []
+        uv = []
+        vertex_count = 0
+        loop_count = 0
+        for data, matrices in parts:
+            arrays = cls.get_mesh_arrays(data)
+            count = len(matrices)
+            vertices = len(arrays["co"])
+            loops = len(arrays["vertex_index"])
+
+            # (count, vertices, 3) transformed copies
+            co.append(np.einsum("kij,vj->kvi", matrices[:, :3, :3], arrays["co"]) + matrices[:, np.newaxis, :3, 3])
+
+            copy_index = np.arange(count)[:, np.newaxis]
+            vertex_index.append(arrays["vertex_index"] + copy_index * vertices + vertex_count)
+            loop_start.append(arrays["loop_start"] + copy_index * loops + loop_count)
+            loop_total.append(np.tile(arrays["loop_total"], count))
+            use_smooth.append(np.tile(arrays["use_smooth"], count))
+            uv.append(np.tile(arrays.get("uv", np.zeros((loops, 2), dtype=np.float32)), (count, 1)))
+
+            # material slots of all meshes merged by material
+            slots = []
+            for material in data.materials:
+                if material not in materials:
+                    materials.append(material)
+                slots.append(materials.index(material))
+            slot_index = np.array(slots or [0], dtype=np.int32)
+            material_index.append(np.tile(slot_index[np.minimum(arrays["material_index"], len(slot_index) - 1)], count))
+
+            vertex_count += count * vertices
+            loop_count += count * loops
+
+        mesh = bpy.data.meshes.new(name)
+        for material in materials:
+            mesh.materials.append(material)
+        if not parts:
+            return mesh
+
+        mesh.vertices.add(vertex_count)
+        mesh.vertices.foreach_set("co", np.concatenate([c.reshape(-1, 3) for c in co]).astype(np.float32).ravel())
+        mesh.loops.add(loop_count)
+        mesh.loops.foreach_set("vertex_index", np.concatenate([v.ravel() for v in vertex_index]).astype(np.int32))
+        mesh.polygons.add(sum(len(t) for t in loop_total))
+        mesh.polygons.foreach_set("loop_start", np.concatenate([l.ravel() for l in loop_start]).astype(np.int32))
+        mesh.polygons.foreach_set("loop_total", np.concatenate(loop_total))
+        mesh.polygons.foreach_set("material_index", np.concatenate(material_index))
+        mesh.polygons.foreach_set("use_smooth", np.concatenate(use_smooth))
+        if any(data.uv_layers.active is not None for data, matrices in parts):
+            mesh.uv_textures.new()
+            mesh.uv_layers[0].data.foreach_set("uv", np.concatenate(uv).ravel())
+        mesh.update(calc_edges=True)
+
+        return mesh
 
     def select_object(self, obj):
         bpy.ops.object.select_all(action='DESELECT')
@@ -305,5 +503,11 @@ class CircularArray():
         bpy.context.scene.objects.active = obj
 
 if __name__ == "__main__":
-    with LoggingToTextContext(logger):
-        CircularArray().execute()
+    with text_logging.LoggingToTextContext(logger, log_level):
+        if realize:
+            CircularArray.realize(bpy.context.selected_objects)
+        elif multi_rig:
+            CircularArray.execute_batch(bpy.context.selected_objects, driver_mode, bake_frames)
+        else:
+            CircularArray(driver_mode, bake_frames).execute()
+    profiling.dump_text()
@@ -0,0 +1,156 @@
+import bpy
+import bulk_edit
+import dot_graph
+import graph_layout
+import math
+import numpy as np
+import os
+import profiling
+import text_logging
+
+logger = text_logging.get_logger("create_dot_graph")
+
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+file_path = os.path.join(os.path.dirname(bpy.data.filepath), "graphviz", "test.dot") # .dot file to import
+labels = True # False: nodes and edges only
+layout = "force" # "force": force-directed (graph_layout), "grid": nodes on a grid
+dimensions = 3 # 2: force-directed layout in the xy plane
+iterations = 100 # force-directed layout iterations
+seed = 0 # initial layout seed, None: random
+
+class CreateDotGraph():
+    # the whole graph is two meshes: one octahedron per node, one edge per graph edge
+    # labels are text objects, objects with the same label share one text curve
+    node_co = np.array([(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)], dtype=np.float32)
+    node_faces = np.array([(0, 2, 4), (2, 1, 4), (1, 3, 4), (3, 0, 4), (2, 0, 5), (1, 2, 5), (3, 1, 5), (0, 3, 5)])
+
+    def __init__(self, file_path, labels=True, layout="force", dimensions=3, iterations=100, seed=0,
+                 node_size=0.1, spacing=1.0, label_size=0.2):
+        logger.info("start")
+
+        self.file_path = file_path
+        self.labels = labels
+        self.layout = layout
+        self.dimensions = dimensions
+        self.iterations = iterations
+        self.seed = seed
+        self.node_size = node_size
+        self.spacing = spacing
+        self.label_size = label_size
+        self.graph = None
+        self.nodes_obj = None
+        self.edges_obj = None
+        self.label_objects = []
+
+        logger.info("end")
+
+    @profiling.step
+    def execute(self, coordinates=None):
+        logger.info("start")
+
+        self.graph = self.read_graph()
+        co = self.create_layout(self.graph) if coordinates is None else np.asarray(coordinates, dtype=np.float32)
+
+        with bulk_edit.BulkEditContext(logger):
+            self.nodes_obj = self.link_object(self.graph.name + "_nodes", self.create_nodes_mesh(co))
+            self.edges_obj = self.link_object(self.graph.name + "_edges", self.create_edges_mesh(co, self.graph.get_edge_array()))
+            if self.labels:
+                self.create_labels(co)
+
+            bulk_edit.update()
+
+        logger.info("end")
+
+    @profiling.step
+    def read_graph(self):
+        graph = dot_graph.load(self.file_path)
+        logger.info("%s: %d nodes, %d edges", graph.name, len(graph.nodes), len(graph.edges))
+        return graph
+
+    @profiling.step
+    def create_layout(self, graph):
+        if self.layout == "grid":
+            return self.create_grid_layout(graph)
+
+        co = graph_layout.force_layout(graph.get_edge_array(), len(graph.nodes), self.dimensions, self.iterations, self.seed)
+        return co * self.spacing
+
+    def create_grid_layout(self, graph):
+        # nodes on a square grid in the xy plane
+        count = len(graph.nodes)
+        columns = max(int(math.ceil(math.sqrt(count))), 1)
+        index = np.arange(count)
+        co = np.zeros((count, 3), dtype=np.float32)
+        co[:, 0] = index % columns * self.spacing
+        co[:, 1] = index // columns * -self.spacing
+        return co
+
+    def link_object(self, name, data):
+        obj = bpy.data.objects.new(name, data)
+        bpy.context.scene.objects.link(obj)
+        return obj
+
+    @profiling.step
+    def create_nodes_mesh(self, co):
+        count = len(co)
+        vertex_co = self.node_co[np.newaxis] * self.node_size + co[:, np.newaxis]
+        vertex_index = self.node_faces[np.newaxis] + 6 * np.arange(count)[:, np.newaxis, np.newaxis]
+
+        mesh = bpy.data.meshes.new(self.graph.name + "_nodes")
+        mesh.vertices.add(count * 6)
+        mesh.vertices.foreach_set("co", vertex_co.astype(np.float32).ravel())
+        mesh.loops.add(count * 24)
+        mesh.loops.foreach_set("vertex_index", vertex_index.astype(np.int32).ravel())
+        mesh.polygons.add(count * 8)
+        mesh.polygons.foreach_set("loop_start", np.arange(0, count * 24, 3, dtype=np.int32))
+        mesh.polygons.foreach_set("loop_total", np.full(count * 8, 3, dtype=np.int32))
+        mesh.update(calc_edges=True)
+
+        return mesh
+
+    @profiling.step
+    def create_edges_mesh(self, co, edges):
+        mesh = bpy.data.meshes.new(self.graph.name + "_edges")
+        mesh.vertices.add(len(co))
+        mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+        mesh.edges.add(len(edges))
+        mesh.edges.foreach_set("vertices", edges.astype(np.int32).ravel())
+        mesh.update()
+
+        return mesh
+
+    @profiling.step
+    def create_labels(self, co):
+        graph = self.graph
+        items = list(zip(graph.node_labels, co + (0.0, 0.0, self.node_size * 2)))
+
+        edges = graph.get_edge_array()
+        if len(edges):
+            midpoints = (co[edges[:, 0]] + co[edges[:, 1]]) / 2
+            items += [(label, location) for label, location in zip(graph.edge_labels, midpoints) if label is not None]
+
+        curves = {}
+        scene = bpy.context.scene
+        for label, location in items:
+            curve = curves.get(label)
+            if curve is None:
+                curve = curves[label] = self.create_text(label)
+
+            obj = bpy.data.objects.new(label, curve)
+            obj.location = location.tolist()
+            scene.objects.link(obj)
+            self.label_objects.append(obj)
+
+        logger.info("%d labels, %d texts", len(self.label_objects), len(curves))
+
+    def create_text(self, label):
+        curve = bpy.data.curves.new(label, type='FONT')
+        curve.body = label
+        curve.size = self.label_size
+        curve.align_x = 'CENTER'
+        return curve
+
+if __name__ == "__main__":
+    with text_logging.LoggingToTextContext(logger, log_level):
+        CreateDotGraph(file_path, labels, layout, dimensions, iterations, seed).execute()
+    profiling.dump_text()
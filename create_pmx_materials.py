@@ -1,101 +1,239 @@
 import bpy
-import io
-import logging
+import bmesh
+import bulk_edit
+import collections
+import image_index
 import math
 import numpy as np
+import profiling
+import text_logging
 
-logger = logging.getLogger("pmx_materials")
+logger = text_logging.get_logger("pmx_materials")
 
-if not logger.handlers:
-    hdlr = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-    hdlr.setFormatter(formatter)
-    logger.addHandler(hdlr)
-    logger.setLevel(logging.DEBUG) # DEBUG, INFO, WARNING, ERROR, CRITICAL
-
-logger.debug("init logger") # debug, info, warning, error, critical
-
-class LoggingToTextContext():
-    def __init__(self, logger):
-        self.logger = logger
-        self.stream = io.StringIO()
-        self.handler = logging.StreamHandler(self.stream)
-        formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-        self.handler.setFormatter(formatter)
-        self.handler.setLevel(logging.INFO)
-        self.logger.addHandler(self.handler)
-
-    def __enter__(self):
-        return None
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        log_file_name = "log"
-        texts = bpy.data.texts
-        text = texts[log_file_name] if log_file_name in texts else texts.new(log_file_name)
-        text.clear()
-        text.write(self.stream.getvalue())
-
-        self.logger.removeHandler(self.handler)
-        self.stream.close()
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+batch = False # True: create pmx_materials for every armature in the file
+index_images = False # True: find byte-identical image files used by the materials
+remap_images = False # True: also point the materials to one image per group of identical images
 
 class CreatePMXMaterials():
-    def __init__(self):
+    def __init__(self, armature_index=None, index_images=False, remap_images=False, hash_cache=None):
         logger.info("start")
 
+        self.arm_obj = None
         self.arm = None
         self.objects = []
         self.materials = []
         self.pmx_materials = None
+        self.armature_index = armature_index
+        self.index_images = index_images or remap_images
+        self.remap_images = remap_images
+        self.hash_cache = {} if hash_cache is None else hash_cache
+        self.image_groups = []
 
         logger.info("end")
 
-    def execute(self):
+    @classmethod
+    @profiling.step
+    def execute_all(cls, index_images=False, remap_images=False):
         logger.info("start")
 
-        self.get_armature()
+        armature_index = cls.create_armature_index()
+        sphere = cls.create_sphere()
+
+        # files shared by several armatures are hashed once
+        hash_cache = {}
+        proxies = []
+        with bulk_edit.BulkEditContext(logger):
+            for name in armature_index:
+                creator = cls(armature_index, index_images, remap_images, hash_cache)
+                creator.get_armature(bpy.data.objects[name])
+                creator.get_objects()
+                creator.get_materials()
+                creator.dedup_images()
+                creator.create_object_from_data(sphere.copy())
+                creator.set_materials()
+                proxies.append(creator.pmx_materials)
+
+            bpy.data.meshes.remove(sphere)
+            bulk_edit.update()
+
+        logger.info("end")
+
+        return proxies
+
+    @staticmethod
+    @profiling.step
+    def create_sphere():
+        mesh = bpy.data.meshes.new("pmx_materials")
+
+        bm = bmesh.new()
+        bmesh.ops.create_uvsphere(bm, u_segments=16, v_segments=8, diameter=0.2)
+        bm.to_mesh(mesh)
+        bm.free()
+
+        mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
+        mesh.update()
+
+        return mesh
+
+    @staticmethod
+    @profiling.step
+    def create_armature_index():
+        armature_index = collections.OrderedDict()
+        for obj in bpy.data.objects:
+            armature = obj.find_armature()
+            if armature is None:
+                continue
+
+            armature_index.setdefault(armature.name, []).append(obj)
+
+        return armature_index
+
+    @profiling.step
+    def execute(self, armature=None):
+        logger.info("start")
+
+        self.get_armature(armature)
         self.get_objects()
         self.get_materials()
+        self.dedup_images()
         self.create_object()
         self.set_materials()
 
         logger.info("end")
 
-    def get_armature(self):
-        self.arm = bpy.context.object.data
+    @profiling.step
+    def get_armature(self, armature=None):
+        self.arm_obj = bpy.context.object if armature is None else armature
+        self.arm = self.arm_obj.data
         if self.arm is None:
             logger.error("arm is None")
         else:
             logger.info("end")
 
+    @profiling.step
     def get_objects(self):
-        for obj in bpy.data.objects:
-            if obj.find_armature() is None:
-                continue
+        if self.armature_index is None:
+            self.armature_index = self.create_armature_index()
 
-            if obj.find_armature().name == self.arm.name:
-                self.objects.append(obj)
+        # the index is keyed by armature object name, which may differ from the armature data name
+        self.objects = self.armature_index.get(self.arm_obj.name, [])
 
+    @profiling.step
     def get_materials(self):
+        seen = set()
         for obj in self.objects:
             for material in obj.data.materials:
-                if material not in self.materials:
+                if material not in seen:
+                    seen.add(material)
                     self.materials.append(material)
 
+    def dedup_images(self):
+        if not self.index_images:
+            return
+
+        self.image_groups = self.create_image_index(self.get_image_users())
+        if self.remap_images:
+            self.remap_image_users(self.image_groups)
+
+    @profiling.step
+    def get_image_users(self):
+        # image -> texture datablocks (blender render) and image nodes (cycles) of the materials that use it
+        users = collections.OrderedDict()
+        for material in self.materials:
+            # empty material slots are kept in self.materials for set_materials
+            if material is None:
+                continue
+            for slot in material.texture_slots:
+                if slot is not None and slot.texture is not None and slot.texture.type == 'IMAGE' and slot.texture.image is not None:
+                    users.setdefault(slot.texture.image, []).append(slot.texture)
+            if material.node_tree is not None:
+                for node in material.node_tree.nodes:
+                    if node.type == 'TEX_IMAGE' and node.image is not None:
+                        users.setdefault(node.image, []).append(node)
+        return users
+
+    @profiling.step
+    def create_image_index(self, image_users):
+        # [[(image, users)]] of images with identical files, the first image of a group is kept
+        paths = collections.OrderedDict()
+        for image in image_users:
+            if image.packed_file is not None:
+                logger.debug("skip packed image " + image.name)
+                continue
+            if not image.filepath:
+                logger.debug("skip generated image " + image.name)
+                continue
+            paths.setdefault(bpy.path.abspath(image.filepath, library=image.library), []).append(image)
+
+        groups, sizes = image_index.find_duplicates(list(paths), cache=self.hash_cache)
+
+        # images of identical files, or of the same file; images without a readable file are never grouped
+        group_keys = {path: group[0] for group in groups for path in group}
+        images = collections.OrderedDict()
+        for path, path_images in paths.items():
+            if path not in sizes:
+                logger.debug("skip missing file " + path)
+                continue
+            images.setdefault(group_keys.get(path, path), []).extend(path_images)
+
+        image_groups = [[(image, image_users[image]) for image in group] for group in images.values() if len(group) > 1]
+
+        file_bytes = sum(sizes[group[0]] * (len(group) - 1) for group in groups)
+        logger.info("%d images, %d groups of identical images, %d duplicate file bytes",
+                    len(image_users), len(image_groups), file_bytes)
+        for group in image_groups:
+            logger.info("identical: " + ", ".join(image.name for image, users in group))
+
+        return image_groups
+
+    @profiling.step
+    def remap_image_users(self, image_groups):
+        pixel_bytes = 0
+        for group in image_groups:
+            shared = group[0][0]
+            for image, users in group[1:]:
+                for user in users:
+                    user.image = shared
+                if image.has_data:
+                    pixel_bytes += image.size[0] * image.size[1] * image.channels * (4 if image.is_float else 1)
+
+        logger.info("%d images remapped, %d bytes of loaded pixels saved",
+                    sum(len(group) - 1 for group in image_groups), pixel_bytes)
+
+    @profiling.step
     def create_object(self):
-        bpy.ops.mesh.primitive_uv_sphere_add(segments=16, ring_count=8, size=0.2, location=(2.0, 0.0, 0.0))
-        bpy.ops.object.shade_smooth()
-        self.pmx_materials = bpy.context.object
+        with bulk_edit.BulkEditContext(logger):
+            bpy.ops.mesh.primitive_uv_sphere_add(segments=16, ring_count=8, size=0.2, location=(2.0, 0.0, 0.0))
+            bpy.ops.object.shade_smooth()
+            self.pmx_materials = bpy.context.object
+            self.pmx_materials.name = "pmx_materials"
+
+            self.set_lock()
+
+    @profiling.step
+    def create_object_from_data(self, mesh):
+        self.pmx_materials = bpy.data.objects.new("pmx_materials", mesh)
+        self.pmx_materials.location = (2.0, 0.0, 0.0)
+        bpy.context.scene.objects.link(self.pmx_materials)
 
-        self.pmx_materials.name = "pmx_materials"
+        self.set_lock()
+
+    def set_lock(self):
         self.pmx_materials.lock_rotation = (True, True, True)
         self.pmx_materials.lock_scale = (True, True, True)
         self.pmx_materials.lock_location[1] = True
         self.pmx_materials.lock_location[2] = True
 
+    @profiling.step
     def set_materials(self):
         for material in self.materials:
             self.pmx_materials.data.materials.append(material)
 
 if __name__ == "__main__":
-    with LoggingToTextContext(logger):
-        CreatePMXMaterials().execute()
+    with text_logging.LoggingToTextContext(logger, log_level):
+        if batch:
+            CreatePMXMaterials.execute_all(index_images, remap_images)
+        else:
+            CreatePMXMaterials(None, index_images, remap_images).execute()
+    profiling.dump_text()
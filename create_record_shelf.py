@@ -1,59 +1,40 @@
 import bpy
-import logging
-import io
+import bulk_edit
 import math
-import random
-
-logger = logging.getLogger("record_shelf")
-
-if not logger.handlers:
-    hdlr = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-    hdlr.setFormatter(formatter)
-    logger.addHandler(hdlr)
-    logger.setLevel(logging.DEBUG) # DEBUG, INFO, WARNING, ERROR, CRITICAL
-
-logger.debug("init logger") # debug, info, warning, error, critical
-
-class LoggingToTextContext():
-    def __init__(self, logger):
-        self.logger = logger
-        self.stream = io.StringIO()
-        self.handler = logging.StreamHandler(self.stream)
-        formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-        self.handler.setFormatter(formatter)
-        self.handler.setLevel(logging.INFO)
-        self.logger.addHandler(self.handler)
-
-    def __enter__(self):
-        return None
+import numpy as np
+import profiling
+import record_shelf_layout
+import text_logging
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        log_file_name = "log"
-        texts = bpy.data.texts
-        text = texts[log_file_name] if log_file_name in texts else texts.new(log_file_name)
-        text.clear()
-        text.write(self.stream.getvalue())
+logger = text_logging.get_logger("record_shelf")
 
-        self.logger.removeHandler(self.handler)
-        self.stream.close()
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+instanced = False # True: all records of a shelf as one pre-solidified mesh
+seed = None # record layout seed, None: random
 
 class CreateRecordShelf():
 
-    def __init__(self):
+    def __init__(self, instanced=False, seed=None):
         logger.info("start")
 
+        self.instanced = instanced
+        self.seed = seed
         self.record_data = None
 
         logger.info("end")
 
+    @profiling.step
     def execute(self):
         logger.info("start")
 
-        self.record_data = Record().create_data()
-
-        shelf = Shelf()
-        shelf.create(self.record_data)
+        with bulk_edit.BulkEditContext(logger):
+            shelf = Shelf()
+            layout = shelf.create_layout(self.seed)
+            if self.instanced:
+                shelf.create_instanced(layout)
+            else:
+                self.record_data = Record().create_data()
+                shelf.create(self.record_data, layout)
 
         logger.info("end")
 
@@ -65,24 +46,46 @@ class Shelf():
         self.size = 0.315
         self.obj = None
 
-    def create(self, record_data):
+    @profiling.step
+    def create(self, record_data, layout=None):
+        self.create_empty()
+        self.create_records(record_data, self.create_layout() if layout is None else layout)
+
+    @profiling.step
+    def create_instanced(self, layout=None):
+        self.create_empty()
+        self.create_records_mesh(self.create_layout() if layout is None else layout)
+
+    @profiling.step
+    def create_layout(self, seed=None):
+        return record_shelf_layout.create_layout(seed, self.scale, Record.thickness)
+
+    def create_empty(self):
         bpy.ops.object.empty_add(type='IMAGE', radius=self.size / self.scale)
         self.obj = bpy.context.object
 
-        self.create_records(record_data)
+    @profiling.step
+    def create_records(self, record_data, layout):
+        with bulk_edit.BulkEditContext(logger):
+            for location in layout.tolist():
+                record = Record()
+                record.create(record_data, (location, 0.0, 0.0))
 
-    def create_records(self, record_data):
-        location = 0.0
-        location_def = 0.0
-        for i in range(random.randint(10,20)):
-            record = Record()
+                child_of_const = record.obj.constraints.new(type='CHILD_OF')
+                child_of_const.target = self.obj
 
-            location += random.uniform(Record.thickness,Record.thickness + 2.0 / self.scale)
-            record.create(record_data, (location / self.scale, 0.0, 0.0))
+    def create_offsets(self, layout):
+        offsets = np.zeros((len(layout), 3))
+        offsets[:, 0] = layout
+        return offsets
 
-            child_of_const = record.obj.constraints.new(type='CHILD_OF')
-            child_of_const.target = self.obj
+    @profiling.step
+    def create_records_mesh(self, layout):
+        obj = bpy.data.objects.new("records", Record.create_mesh(self.create_offsets(layout)))
+        bpy.context.scene.objects.link(obj)
 
+        child_of_const = obj.constraints.new(type='CHILD_OF')
+        child_of_const.target = self.obj
 
 class Record():
     scale = bpy.context.scene.unit_settings.scale_length
@@ -92,7 +95,38 @@ class Record():
     def __init__(self):
         self.obj = None
 
+    @profiling.step
     def create_data(self):
+        key = self.get_data_key()
+
+        data = self.find_data(key)
+        if data is None:
+            data = self.make_data()
+            data["record_key"] = key
+        else:
+            logger.info("reuse " + data.name)
+
+        self.remove_orphan_data(key)
+
+        return data
+
+    def get_data_key(self):
+        return "%r,%r,%r" % (self.size, self.thickness, self.scale)
+
+    def find_data(self, key):
+        for data in bpy.data.meshes:
+            if data.get("record_key") == key:
+                return data
+        return None
+
+    def remove_orphan_data(self, key):
+        orphans = [data for data in bpy.data.meshes if data.get("record_key", key) != key and data.users == 0]
+        for data in orphans:
+            logger.info("remove " + data.name)
+            bpy.data.meshes.remove(data)
+
+    @profiling.step
+    def make_data(self):
         bpy.ops.mesh.make_wplane()
         obj = bpy.context.object
 
@@ -106,6 +140,32 @@ class Record():
 
         return data
 
+    @classmethod
+    @profiling.step
+    def create_mesh(cls, offsets, name="records"):
+        # a record as created by create() (plane rotated -90 on y, solidified toward +x) is this box
+        size = cls.size / cls.scale
+        thickness = cls.thickness / cls.scale
+        box_co = np.array([(x, y, z) for z in (0.0, size) for y in (0.0, size) for x in (0.0, thickness)])
+        box_faces = np.array([(0, 4, 6, 2), (1, 3, 7, 5), (0, 1, 5, 4), (2, 6, 7, 3), (0, 2, 3, 1), (4, 5, 7, 6)])
+
+        count = len(offsets)
+        co = box_co[np.newaxis] + np.asarray(offsets)[:, np.newaxis]
+        vertex_index = box_faces[np.newaxis] + 8 * np.arange(count)[:, np.newaxis, np.newaxis]
+
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(count * 8)
+        mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+        mesh.loops.add(count * 24)
+        mesh.loops.foreach_set("vertex_index", vertex_index.astype(np.int32).ravel())
+        mesh.polygons.add(count * 6)
+        mesh.polygons.foreach_set("loop_start", np.arange(0, count * 24, 4, dtype=np.int32))
+        mesh.polygons.foreach_set("loop_total", np.full(count * 6, 4, dtype=np.int32))
+        mesh.update(calc_edges=True)
+
+        return mesh
+
+    @profiling.step
     def create(self, data, location):
         self.obj = bpy.data.objects.new("record", data)
         bpy.context.scene.objects.link(self.obj)
@@ -120,5 +180,6 @@ class Record():
 
 
 if __name__ == "__main__":
-    with LoggingToTextContext(logger):
-        CreateRecordShelf().execute()
+    with text_logging.LoggingToTextContext(logger, log_level):
+        CreateRecordShelf(instanced, seed).execute()
+    profiling.dump_text()
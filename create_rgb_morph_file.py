@@ -1,106 +1,286 @@
 import bpy
-import collections
-import io
+import hashlib
 import json
-import logging
-
-logger = logging.getLogger("create_rgb_morph_file")
-
-if not logger.handlers:
-    hdlr = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-    hdlr.setFormatter(formatter)
-    logger.addHandler(hdlr)
-    logger.setLevel(logging.DEBUG) # DEBUG, INFO, WARNING, ERROR, CRITICAL
-
-logger.debug("init logger") # debug, info, warning, error, critical
-
-class LoggingToTextContext():
-    def __init__(self, logger):
-        self.logger = logger
-        self.stream = io.StringIO()
-        self.handler = logging.StreamHandler(self.stream)
-        formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-        self.handler.setFormatter(formatter)
-        self.handler.setLevel(logging.DEBUG)
-        self.logger.addHandler(self.handler)
-
-    def __enter__(self):
-        return None
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        log_file_name = "log"
-        texts = bpy.data.texts
-        text = texts[log_file_name] if log_file_name in texts else texts.new(log_file_name)
-        text.clear()
-        text.write(self.stream.getvalue())
-
-        self.logger.removeHandler(self.handler)
-        self.stream.close()
+import os
+import pmx_morph
+import profiling
+import text_logging
+
+logger = text_logging.get_logger("create_rgb_morph_file")
+
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+file_path = None # write the json to this file instead of a text block
+compact = False # True: no indentation
+binary_path = None # also write the pmx morph section to this file
+pmx_materials = None # material names in pmx order for the binary, None: the materials of the pmx_materials object
+incremental = False # True: only regenerate morphs whose inputs changed since the last run
 
 class CreateRGBMorphFile():
+    default_spec = {
+        "materials": ["head"],
+        "morphs": [ # name, panel, index(, materials)
+            ("cyan", 2, 0),
+            ("magenta", 3, 1),
+            ("yellow", 1, 2),
+        ],
+    }
 
-    def __init__(self):
+    def __init__(self, spec=None, file_path=None, compact=False, chunk_size=65536, binary_path=None, incremental=False,
+                 pmx_materials=None):
         logger.info("start")
 
         self.file_name = "morph_data_stick.json"
+        self.spec = self.default_spec if spec is None else spec
+        self.file_path = file_path
+        self.compact = compact
+        self.chunk_size = chunk_size
+        self.binary_path = binary_path
+        self.incremental = incremental
+        self.pmx_materials = pmx_materials
+        self.previous = None
+        self.spans = []
+        self.output_hash = hashlib.sha1()
 
         logger.info("end")
 
+    @profiling.step
     def execute(self):
         logger.info("start")
 
-        data_list = []
-        data_list.append(("cyan",2,0)) # name, panel, index
-        data_list.append(("magenta",3,1))
-        data_list.append(("yellow",1,2))
+        if self.incremental:
+            self.previous = self.read_previous()
 
-        morphs = collections.OrderedDict()
-        for name, panel, index in data_list:
-            logger.debug(name)
-            morphs[name] = self.create_morph(panel, index)
+        if self.file_path is None:
+            self.write_text()
+        else:
+            self.write_file()
 
-        jsonstring = json.dumps(morphs, ensure_ascii=False, indent=2, sort_keys=False)
+        if self.incremental:
+            self.write_index()
 
-        if self.file_name in bpy.data.texts:
-            bpy.data.texts.remove(bpy.data.texts[self.file_name], do_unlink=True)
-
-        text = bpy.data.texts.new(self.file_name)
-        text.from_string(jsonstring)
+        if self.binary_path is not None:
+            self.write_binary()
 
         logger.info("end")
 
-    def create_morph(self, panel, index):
+    @profiling.step
+    def write_text(self):
+        if self.incremental and self.file_name in bpy.data.texts:
+            text = bpy.data.texts[self.file_name]
+            text.clear()
+        else:
+            if self.file_name in bpy.data.texts:
+                bpy.data.texts.remove(bpy.data.texts[self.file_name], do_unlink=True)
+            text = bpy.data.texts.new(self.file_name)
+
+        for chunk in self.iter_chunks():
+            text.write(chunk)
+
+    @profiling.step
+    def write_file(self):
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            for chunk in self.iter_chunks():
+                f.write(chunk)
+
+    @profiling.step
+    def write_binary(self):
+        with open(self.binary_path, "wb") as f:
+            pmx_morph.write_morphs(f, self.iter_morphs(), self.get_materials())
+
+    def get_index_name(self):
+        return (self.file_name if self.file_path is None else self.file_path) + ".index"
+
+    @profiling.step
+    def read_previous(self):
+        index_name = self.get_index_name()
+        if self.file_path is None:
+            texts = bpy.data.texts
+            if self.file_name not in texts or index_name not in texts:
+                return None
+            output = texts[self.file_name].as_string()
+            index = json.loads(texts[index_name].as_string())
+        else:
+            if not os.path.exists(self.file_path) or not os.path.exists(index_name):
+                return None
+            with open(self.file_path, encoding="utf-8") as f:
+                output = f.read()
+            with open(index_name, encoding="utf-8") as f:
+                index = json.load(f)
+
+        # an output edited by hand or written in the other format is regenerated from scratch
+        if index["compact"] != self.compact or index["hash"] != hashlib.sha1(output.encode("utf-8")).hexdigest():
+            logger.info("index does not match " + self.file_name)
+            return None
+
+        return output, {name: (key, start, end) for name, key, start, end in index["morphs"]}
+
+    @profiling.step
+    def write_index(self):
+        index = {}
+        index["compact"] = self.compact
+        index["hash"] = self.output_hash.hexdigest()
+        index["morphs"] = self.spans
+        index_string = json.dumps(index, ensure_ascii=False)
+
+        index_name = self.get_index_name()
+        if self.file_path is None:
+            texts = bpy.data.texts
+            text = texts[index_name] if index_name in texts else texts.new(index_name)
+            text.from_string(index_string)
+        else:
+            with open(index_name, "w", encoding="utf-8") as f:
+                f.write(index_string)
+
+    def iter_chunks(self):
+        self.output_hash = hashlib.sha1()
+
+        buffer = []
+        size = 0
+        for s in self.iter_json():
+            buffer.append(s)
+            size += len(s)
+            if size >= self.chunk_size:
+                chunk = "".join(buffer)
+                if self.incremental:
+                    self.output_hash.update(chunk.encode("utf-8"))
+                yield chunk
+                buffer = []
+                size = 0
+
+        if buffer:
+            chunk = "".join(buffer)
+            if self.incremental:
+                self.output_hash.update(chunk.encode("utf-8"))
+            yield chunk
+
+    def get_json_format(self):
+        # encoder, begin, separator, end, key separator, indent
+        if self.compact:
+            encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=MaterialOffset.to_dict)
+            return encoder, "{", ",", "}", ":", ""
+        else:
+            encoder = json.JSONEncoder(ensure_ascii=False, indent=2, default=MaterialOffset.to_dict)
+            return encoder, "{\n  ", ",\n  ", "\n}", ": ", "\n  "
+
+    def iter_json(self):
+        encoder, begin, separator, end, key_separator, indent = self.get_json_format()
+        previous_output, previous_index = self.previous if self.previous is not None else ("", {})
+
+        self.spans = []
+        position = 0
+        regenerated = 0
+        for name, panel, index, materials in self.iter_spec():
+            s = begin if not self.spans else separator
+            yield s
+            position += len(s)
+
+            key = self.get_morph_key(name, panel, index, materials)
+            previous = previous_index.get(name)
+            if previous is not None and previous[0] == key:
+                fragment = previous_output[previous[1]:previous[2]]
+            else:
+                logger.debug(name)
+                # each morph is encoded on its own and indented one level, as json.dumps(indent=2) does for the whole dict
+                fragment = encoder.encode(name) + key_separator + encoder.encode(self.create_morph(panel, index, materials)).replace("\n", indent)
+                regenerated += 1
+            yield fragment
+
+            self.spans.append((name, key, position, position + len(fragment)))
+            position += len(fragment)
+
+        yield "{}" if not self.spans else end
+
+        logger.info("%d of %d morphs generated", regenerated, len(self.spans))
+
+    def iter_spec(self):
+        for morph in self.spec["morphs"]:
+            materials = morph[3] if len(morph) > 3 else self.spec["materials"]
+            yield morph[0], morph[1], morph[2], materials
+
+    def get_materials(self):
+        # material indices in the binary are positions in the model's pmx material order, which the spec does not
+        # know: it is given, or read from the pmx_materials object made by create_pmx_materials.py
+        if self.pmx_materials is not None:
+            return list(self.pmx_materials)
+
+        obj = bpy.data.objects.get("pmx_materials")
+        if obj is None:
+            raise ValueError("pmx material order unknown: pass pmx_materials or run create_pmx_materials.py first")
+        return [material.name for material in obj.data.materials if material is not None]
+
+    def iter_morphs(self):
+        for name, panel, index, materials in self.iter_spec():
+            logger.debug(name)
+            yield name, self.create_morph(panel, index, materials)
+
+    def get_morph_key(self, name, panel, index, materials):
+        return hashlib.sha1(json.dumps([name, panel, index, list(materials)], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def create_morph(self, panel, index, materials=None):
         morph = {}
 
         morph["panel"] = panel #1:眉(左下) 2:目(左上) 3:口(右上) 4:その他(右下)  | 0:システム予約
         morph["type"] = 8
-        morph["offsets"] = self.create_offsets(index)
+        morph["offsets"] = self.create_offsets(index, materials)
 
         return morph
 
-    def create_offsets(self, index):
+    def create_offsets(self, index, materials=None):
         offsets = []
-        offset = {}
-        offset["material_name"] = "head"
-        offset["offset_type"] = 1
-        offset["diffuse"] = [0,0,0,0]
-        offset["specular"] = [0,0,0]
-        offset["power"] = 0
-        offset["ambient"] = [0,0,0]
-        offset["edge_size"] = 0
-        offset["edge_color"] = [0,0,0,0]
-        offset["texture"] = [0,0,0,0]
-        offset["sphere"] = [0,0,0,0]
-        offset["toon"] = [0,0,0,0]
+        for material_name in self.spec["materials"] if materials is None else materials:
+            offsets.append(self.create_offset(material_name, index))
+        return offsets
 
+    def create_offset(self, material_name, index):
         # offset["texture"][index] = -1
-        offset["diffuse"][index] = -1
-        offset["ambient"][index] = -1
+        return MaterialOffset(material_name, MaterialOffset.channel_changes(index))
 
-        offsets.append(offset)
-        return offsets
+class MaterialOffset():
+    __slots__ = ("material_name", "changes")
+
+    # (name, default) in output order, defaults are shared and expanded to lists in to_dict
+    fields = (
+        ("offset_type", 1),
+        ("diffuse", (0,0,0,0)),
+        ("specular", (0,0,0)),
+        ("power", 0),
+        ("ambient", (0,0,0)),
+        ("edge_size", 0),
+        ("edge_color", (0,0,0,0)),
+        ("texture", (0,0,0,0)),
+        ("sphere", (0,0,0,0)),
+        ("toon", (0,0,0,0)),
+    )
+    changes_cache = {}
+
+    def __init__(self, material_name, changes=()):
+        self.material_name = material_name
+        self.changes = changes # ((name, index or None, value), ...)
+
+    @classmethod
+    def channel_changes(cls, index):
+        changes = cls.changes_cache.get(index)
+        if changes is None:
+            changes = (("diffuse", index, -1), ("ambient", index, -1))
+            cls.changes_cache[index] = changes
+        return changes
+
+    def to_dict(self):
+        offset = {}
+        offset["material_name"] = self.material_name
+        for name, default in self.fields:
+            offset[name] = list(default) if isinstance(default, tuple) else default
+
+        for name, index, value in self.changes:
+            if index is None:
+                offset[name] = value
+            else:
+                offset[name][index] = value
+
+        return offset
 
 if __name__ == "__main__":
-    with LoggingToTextContext(logger):
-        CreateRGBMorphFile().execute()
+    with text_logging.LoggingToTextContext(logger, log_level):
+        CreateRGBMorphFile(file_path=file_path, compact=compact, binary_path=binary_path, incremental=incremental,
+                           pmx_materials=pmx_materials).execute()
+    profiling.dump_text()
@@ -0,0 +1,230 @@
+import argparse
+import re
+import numpy as np
+
+# Streaming reader for the DOT subset used in graphviz/: graph / digraph, node and edge statements
+# (edge chains, quoted UTF-8 ids), attribute lists, and flattened subgraphs.
+# Only `label` is kept; node / edge / graph defaults and other attributes are parsed and ignored.
+# `python dot_graph.py graph.dot` prints the parsed nodes and edges without blender.
+
+token_re = re.compile(r"""
+    (?P<skip>\s+|//[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<edge>--|->)
+  | (?P<id>-?(?:\.\d+|\d+(?:\.\d*)?)|[^\W\d]\w*)
+  | (?P<punct>[{}\[\];,=:])
+""", re.VERBOSE | re.DOTALL)
+
+class Graph():
+    def __init__(self, name="", directed=False):
+        self.name = name
+        self.directed = directed
+        self.nodes = []
+        self.node_index = {}
+        self.node_labels = []
+        self.edges = []
+        self.edge_labels = []
+
+    def __repr__(self):
+        return "<Graph %r: %d nodes, %d edges>" % (self.name, len(self.nodes), len(self.edges))
+
+    def add_node(self, name, label=None):
+        index = self.node_index.get(name)
+        if index is None:
+            index = len(self.nodes)
+            self.node_index[name] = index
+            self.nodes.append(name)
+            self.node_labels.append(name)
+        if label is not None:
+            self.node_labels[index] = label
+        return index
+
+    def add_edge(self, tail, head, label=None):
+        self.edges.append((self.add_node(tail), self.add_node(head)))
+        self.edge_labels.append(label)
+
+    def get_edge_array(self):
+        return np.array(self.edges, dtype=np.int32).reshape(-1, 2)
+
+def unescape(value):
+    return value.replace("\\\n", "").replace('\\"', '"')
+
+def iter_tokens(f, chunk_size=65536):
+    # yields ("id", value), ("edge", value) or ("punct", value), reading `f` in chunks
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        match = token_re.match(buffer, pos)
+        if not eof and (match is None or match.end() == len(buffer)):
+            # the token may continue in the next chunk
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        if match is None:
+            if pos < len(buffer):
+                raise ValueError("unexpected %r" % buffer[pos:pos + 20])
+            return
+
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        if kind == "string":
+            yield "id", unescape(match.group()[1:-1])
+        else:
+            yield kind, match.group()
+
+class Parser():
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.pushed = []
+
+    def next(self):
+        if self.pushed:
+            return self.pushed.pop()
+        return next(self.tokens, (None, None))
+
+    def push(self, token):
+        self.pushed.append(token)
+
+    def expect_id(self):
+        kind, value = self.next()
+        if kind != "id":
+            raise ValueError("expected an id, got %r" % value)
+        return value
+
+    def parse_attrs(self):
+        # after "[", until "]"
+        attrs = {}
+        while True:
+            kind, value = self.next()
+            if kind is None:
+                raise ValueError("unterminated attribute list")
+            if value == "]" and kind == "punct":
+                return attrs
+            if kind == "punct":
+                continue
+
+            name = value
+            kind, value = self.next()
+            if value == "=" and kind == "punct":
+                attrs[name] = self.expect_id()
+            else:
+                attrs[name] = "true"
+                self.push((kind, value))
+
+    def parse_node_id(self):
+        # drops ports (id:port:compass)
+        name = self.expect_id()
+        while True:
+            token = self.next()
+            if token != ("punct", ":"):
+                self.push(token)
+                return name
+            self.expect_id()
+
+    def parse_header(self):
+        kind, value = self.next()
+        if kind == "id" and value.lower() == "strict":
+            kind, value = self.next()
+        if kind != "id" or value.lower() not in ("graph", "digraph"):
+            raise ValueError("expected graph or digraph, got %r" % value)
+        graph = Graph(directed=value.lower() == "digraph")
+
+        kind, value = self.next()
+        if kind == "id":
+            graph.name = value
+            kind, value = self.next()
+        if (kind, value) != ("punct", "{"):
+            raise ValueError("expected {, got %r" % value)
+        return graph
+
+    def iter_statements(self):
+        # yields ("node", name, attrs), ("edge", [names], attrs) or ("attr", target, attrs)
+        depth = 1
+        while depth:
+            kind, value = self.next()
+            if kind is None:
+                raise ValueError("unexpected end of file")
+
+            if kind == "punct":
+                if value == "{":
+                    depth += 1
+                elif value == "}":
+                    depth -= 1
+                elif value in "[]=:":
+                    raise ValueError("unexpected %r" % value)
+                continue
+
+            keyword = value.lower()
+            if keyword == "subgraph":
+                token = self.next()
+                if token[0] != "id":
+                    self.push(token)
+                continue
+
+            token = self.next()
+            if keyword in ("graph", "node", "edge") and token == ("punct", "["):
+                yield "attr", keyword, self.parse_attrs()
+                continue
+            if token == ("punct", "="):
+                yield "attr", "graph", {value: self.expect_id()}
+                continue
+
+            self.push(token)
+            self.push((kind, value))
+            names = [self.parse_node_id()]
+            token = self.next()
+            while token[0] == "edge":
+                names.append(self.parse_node_id())
+                token = self.next()
+
+            attrs = {}
+            if token == ("punct", "["):
+                attrs = self.parse_attrs()
+            else:
+                self.push(token)
+
+            if len(names) == 1:
+                yield "node", names[0], attrs
+            else:
+                yield "edge", names, attrs
+
+    def parse(self):
+        graph = self.parse_header()
+        for statement, target, attrs in self.iter_statements():
+            label = attrs.get("label")
+            if statement == "node":
+                graph.add_node(target, label)
+            elif statement == "edge":
+                for tail, head in zip(target, target[1:]):
+                    graph.add_edge(tail, head, label)
+            elif target == "graph" and label is not None and not graph.name:
+                graph.name = label
+        return graph
+
+def read(f, chunk_size=65536):
+    return Parser(iter_tokens(f, chunk_size)).parse()
+
+def load(file_path, chunk_size=65536):
+    with open(file_path, encoding="utf-8") as f:
+        return read(f, chunk_size)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse a DOT file and print its nodes and edges.")
+    parser.add_argument("file", help=".dot file")
+    args = parser.parse_args(argv)
+
+    graph = load(args.file)
+    print(graph)
+    for name, label in zip(graph.nodes, graph.node_labels):
+        print("%s\t%s" % (name, label))
+    for (tail, head), label in zip(graph.edges, graph.edge_labels):
+        print("%s\t%s\t%s" % (graph.nodes[tail], graph.nodes[head], label or ""))
+
+if __name__ == "__main__":
+    main()
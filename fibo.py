@@ -1,6 +1,6 @@
 import bpy
-import bmesh
 import math
+import numpy as np
 
 n = 500 # number of points
 # c = 0.01 # scale factor
@@ -8,18 +8,39 @@ n = 500 # number of points
 scale = 0.01
 r_min = 0.0
 r_max = 0.8
+divergence = 137.5 # golden angle (degrees)
 
-mesh = bpy.data.meshes.new(name="Spiral")
-bm = bmesh.new()
+def spiral_coordinates(n, scale=scale, r_min=r_min, r_max=r_max, divergence=divergence, start=0, stop=None):
+    if stop is None:
+        stop = n
 
-for i in range(0, n):
-    theta = i * math.radians(137.5)
+    i = np.arange(start, stop, dtype=np.float64)
+    theta = i * math.radians(divergence)
     r = (r_min + r_max * i / n) * scale
-    bm.verts.new((math.cos(theta) * r, math.sin(theta) * r, 0.0))
 
-bm.to_mesh(mesh)
-mesh.update()
+    co = np.zeros((stop - start, 3), dtype=np.float32)
+    co[:, 0] = np.cos(theta) * r
+    co[:, 1] = np.sin(theta) * r
+    return co
 
-from bpy_extras import object_utils
-object_utils.object_data_add(bpy.context, mesh)
+def create_spiral_mesh(n=n, scale=scale, r_min=r_min, r_max=r_max, divergence=divergence, chunk_size=None, name="Spiral"):
+    mesh = bpy.data.meshes.new(name=name)
+    mesh.vertices.add(n)
 
+    if chunk_size is None:
+        co = spiral_coordinates(n, scale, r_min, r_max, divergence)
+    else:
+        # only the float32 result is allocated for all points, float64 temporaries stay chunk_size long
+        co = np.empty((n, 3), dtype=np.float32)
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            co[start:stop] = spiral_coordinates(n, scale, r_min, r_max, divergence, start, stop)
+
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.update()
+
+    return mesh
+
+if __name__ == "__main__":
+    from bpy_extras import object_utils
+    object_utils.object_data_add(bpy.context, create_spiral_mesh())
@@ -0,0 +1,154 @@
+import argparse
+import numpy as np
+
+# Fruchterman-Reingold force-directed layout in numpy, for graphs without coordinates (graphviz/*.dot).
+#
+# Distances are in units of the ideal edge length k = 1. With method="grid" the repulsion (k^2 / d) is approximated
+# Barnes-Hut style on a hierarchy of uniform grids: nodes in the same or neighbouring finest cells repel exactly,
+# farther cells act through their centroid and node count at the coarsest level where they are still not neighbours.
+# An iteration costs about O(n log n). method="exact" applies the repulsion between all pairs, for small graphs
+# and for comparison.
+# Needs only numpy: `python graph_layout.py graph.dot layout.npy` precomputes a layout for CreateDotGraph.execute(coordinates).
+
+def random_layout(count, dim=3, seed=None):
+    # uniform in a cube with room for one node per unit volume
+    side = max(count, 1) ** (1.0 / dim)
+    return np.random.RandomState(seed).uniform(-side / 2, side / 2, (count, dim))
+
+def get_offsets(values, dim):
+    return np.stack(np.meshgrid(*[values] * dim, indexing="ij"), axis=-1).reshape(-1, dim)
+
+def get_grid(cells, margin=3):
+    # linear keys of integer cell coordinates in a box with `margin` empty cells on each side,
+    # so that the key of a cell + offset is the key of the cell + the key of the offset
+    origin = cells.min(axis=0) - margin
+    extent = cells.max(axis=0) - origin + 1 + margin
+    strides = np.cumprod(np.concatenate(([1], extent[:-1])))
+    return (cells - origin) @ strides, strides, int(np.prod(extent))
+
+def find_cells(keys, sorted_keys, size):
+    # first and last + 1 position of each key in sorted_keys
+    if size <= 4 * len(keys):
+        table = np.searchsorted(sorted_keys, np.arange(size + 1))
+        return table[keys], table[keys + 1]
+    return np.searchsorted(sorted_keys, keys, "left"), np.searchsorted(sorted_keys, keys, "right")
+
+def get_grid_pairs(cells):
+    # pairs (i, j), i != j, of nodes in the same or neighbouring cells
+    count, dim = cells.shape
+    keys, strides, size = get_grid(cells)
+    order = np.argsort(keys, kind="mergesort")
+    sorted_keys = keys[order]
+
+    neighbour_keys = keys[:, np.newaxis] + get_offsets((-1, 0, 1), dim) @ strides
+    start, end = find_cells(neighbour_keys.ravel(), sorted_keys, size)
+    counts = end - start
+
+    i = np.repeat(np.arange(count), counts.reshape(count, -1).sum(axis=1))
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(start, counts) + local]
+    different = i != j
+    return i[different], j[different]
+
+def get_far_field(pos, cells):
+    # repulsion from cells that are not neighbours at the finest level, by their centroid and node count
+    count, dim = pos.shape
+    displacement = np.zeros_like(pos)
+
+    # the children of the parent's neighbours, relative to the parent, and which of them are not neighbours
+    # of a cell with the given parity (position in the parent)
+    children = get_offsets(range(-2, 4), dim)
+    parities = get_offsets((0, 1), dim)
+    far = np.any(np.abs(children[np.newaxis] - parities[:, np.newaxis]) > 1, axis=2)
+    parity_weights = 2 ** np.arange(dim)[::-1]
+
+    while True:
+        # cells at this level, with node count and centroid
+        keys, strides, size = get_grid(cells)
+        unique_keys, first, inverse, mass = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        centroid = accumulate(inverse, pos, len(unique_keys)) / mass[:, np.newaxis]
+
+        parity = cells[first] % 2
+        other_keys = (unique_keys - parity @ strides)[:, np.newaxis] + children @ strides
+        mask = far[parity @ parity_weights]
+        start, end = find_cells(other_keys[mask], unique_keys, size)
+        found = end > start
+        source = np.nonzero(mask)[0][found]
+        target = start[found]
+
+        delta = centroid[source] - centroid[target]
+        distance2 = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-4)
+        force = accumulate(source, delta * (mass[target] / distance2)[:, np.newaxis], len(unique_keys))
+        displacement += force[inverse]
+
+        cells = cells // 2
+        if np.all(cells.max(axis=0) - cells.min(axis=0) <= 1):
+            return displacement
+
+def get_exact_pairs(count):
+    i, j = np.nonzero(~np.eye(count, dtype=bool))
+    return i, j
+
+def accumulate(index, values, count):
+    return np.stack([np.bincount(index, values[:, axis], count) for axis in range(values.shape[1])], axis=1)
+
+def force_layout(edges, count, dim=3, iterations=100, seed=None, method="grid", initial=None):
+    # returns (count, 3) float32 positions, z = 0 for dim=2
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    pos = random_layout(count, dim, seed) if initial is None else np.array(initial, dtype=np.float64)[:, :dim]
+
+    if count < 2:
+        iterations = 0
+
+    temperature = max(count, 1) ** (1.0 / dim) / 10
+    cell_size = 2.0
+    for iteration in range(iterations):
+        if method == "grid":
+            cells = np.floor(pos / cell_size).astype(np.int64)
+            i, j = get_grid_pairs(cells)
+        else:
+            i, j = get_exact_pairs(count)
+
+        delta = pos[i] - pos[j]
+        distance2 = np.maximum(np.einsum("ij,ij->i", delta, delta), 1e-4)
+        displacement = accumulate(i, delta / distance2[:, np.newaxis], count)
+        if method == "grid":
+            displacement += get_far_field(pos, cells)
+
+        delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+        force = delta * np.sqrt(np.einsum("ij,ij->i", delta, delta))[:, np.newaxis]
+        displacement -= accumulate(edges[:, 0], force, count)
+        displacement += accumulate(edges[:, 1], force, count)
+
+        # move at most `temperature`, which cools down linearly
+        limit = temperature * (1.0 - iteration / iterations)
+        length = np.maximum(np.sqrt(np.einsum("ij,ij->i", displacement, displacement)), 1e-9)
+        pos += displacement * (np.minimum(length, limit) / length)[:, np.newaxis]
+
+    co = np.zeros((count, 3), dtype=np.float32)
+    co[:, :dim] = pos - pos.mean(axis=0) if count else pos
+    return co
+
+def main(argv=None):
+    import dot_graph
+    import time
+
+    parser = argparse.ArgumentParser(description="Lay out a DOT graph and save the coordinates as .npy.")
+    parser.add_argument("file", help=".dot file")
+    parser.add_argument("output", help="npy file to write")
+    parser.add_argument("--dim", type=int, default=3, choices=(2, 3))
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--method", default="grid", choices=("grid", "exact"))
+    args = parser.parse_args(argv)
+
+    graph = dot_graph.load(args.file)
+    start = time.perf_counter()
+    co = force_layout(graph.get_edge_array(), len(graph.nodes), args.dim, args.iterations, args.seed, args.method)
+    print("%r: %.3f s" % (graph, time.perf_counter() - start))
+    np.save(args.output, co)
+
+if __name__ == "__main__":
+    main()
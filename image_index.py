@@ -0,0 +1,74 @@
+import argparse
+import concurrent.futures
+import hashlib
+import mmap
+import os
+
+# Finds byte-identical files, e.g. the same texture shipped under different names.
+# Only files whose size is shared by another file are hashed; they are read memory-mapped in a thread pool
+# (hashlib releases the GIL on large buffers). `python image_index.py textures/*.png` lists duplicates without blender.
+
+def hash_file(file_path):
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha1().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha1(data).hexdigest()
+
+def get_sizes(paths):
+    # {path: size} of the readable files
+    sizes = {}
+    for path in set(paths):
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            pass
+    return sizes
+
+def hash_files(paths, max_workers=None, cache=None):
+    # {path: sha1}, cache: {(path, size, mtime): sha1} kept between calls
+    cache = {} if cache is None else cache
+    keys = {}
+    for path in paths:
+        stat = os.stat(path)
+        keys[path] = (path, stat.st_size, stat.st_mtime)
+
+    missing = [path for path in paths if keys[path] not in cache]
+    if missing:
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            for path, digest in zip(missing, executor.map(hash_file, missing)):
+                cache[keys[path]] = digest
+
+    return {path: cache[keys[path]] for path in paths}
+
+def find_duplicates(paths, max_workers=None, cache=None):
+    # [[paths]] of identical files (each sorted, 2 or more paths), {path: size}
+    sizes = get_sizes(paths)
+
+    by_size = {}
+    for path, size in sizes.items():
+        by_size.setdefault(size, []).append(path)
+    candidates = sorted(path for group in by_size.values() if len(group) > 1 for path in group)
+
+    by_digest = {}
+    for path, digest in hash_files(candidates, max_workers, cache).items():
+        by_digest.setdefault(digest, []).append(path)
+
+    groups = sorted(sorted(group) for group in by_digest.values() if len(group) > 1)
+    return groups, sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List byte-identical files.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    groups, sizes = find_duplicates(args.files, args.workers)
+    saved = 0
+    for group in groups:
+        print("\t".join(group))
+        saved += sizes[group[0]] * (len(group) - 1)
+    print("%d groups, %d duplicate bytes" % (len(groups), saved))
+
+if __name__ == "__main__":
+    main()
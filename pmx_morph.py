@@ -0,0 +1,189 @@
+import argparse
+import collections
+import io
+import json
+import struct
+
+# PMX 2.0 morph section (material morphs) as written by CreateRGBMorphFile, without bpy.
+#
+# morph count          int32
+# morph
+#   name               text (int32 byte length + utf-16-le or utf-8)
+#   name (universal)   text
+#   panel              int8
+#   type               int8 (8: material)
+#   offset count       int32
+#   offset
+#     material index   int8 / int16 / int32 (material index size)
+#     offset type      int8 (0: multiply, 1: add)
+#     diffuse          float * 4
+#     specular         float * 3
+#     power            float
+#     ambient          float * 3
+#     edge color       float * 4
+#     edge size        float
+#     texture          float * 4
+#     sphere           float * 4
+#     toon             float * 4
+
+encodings = {0: "utf-16-le", 1: "utf-8"}
+index_formats = {1: "b", 2: "h", 4: "i"}
+
+# (json name, number of floats) in binary order
+offset_fields = (
+    ("diffuse", 4),
+    ("specular", 3),
+    ("power", 1),
+    ("ambient", 3),
+    ("edge_color", 4),
+    ("edge_size", 1),
+    ("texture", 4),
+    ("sphere", 4),
+    ("toon", 4),
+)
+
+int8 = struct.Struct("<b")
+int32 = struct.Struct("<i")
+morph_header = struct.Struct("<bbi")
+
+def get_material_index_size(material_count):
+    if material_count <= 0x7f:
+        return 1
+    elif material_count <= 0x7fff:
+        return 2
+    return 4
+
+def get_offset_struct(material_index_size):
+    return struct.Struct("<" + index_formats[material_index_size] + "b" + "f" * sum(count for name, count in offset_fields))
+
+def write_text(f, text, encoding):
+    data = text.encode(encodings[encoding])
+    f.write(int32.pack(len(data)))
+    f.write(data)
+
+def read_text(f, encoding):
+    length, = int32.unpack(f.read(int32.size))
+    return f.read(length).decode(encodings[encoding])
+
+def write_morphs(f, morphs, materials, encoding=0, material_index_size=None):
+    # morphs: iterable of (name, morph) as CreateRGBMorphFile.iter_morphs, f must be seekable
+    if material_index_size is None:
+        material_index_size = get_material_index_size(len(materials))
+    offset_struct = get_offset_struct(material_index_size)
+    material_indices = {name: i for i, name in enumerate(materials)}
+
+    count_position = f.tell()
+    f.write(int32.pack(0))
+
+    count = 0
+    for name, morph in morphs:
+        write_text(f, name, encoding)
+        write_text(f, "", encoding)
+
+        offsets = morph["offsets"]
+        f.write(morph_header.pack(morph["panel"], morph["type"], len(offsets)))
+        for offset in offsets:
+            if not isinstance(offset, dict):
+                offset = offset.to_dict()
+
+            values = []
+            for field, field_count in offset_fields:
+                value = offset[field]
+                values.extend(value if field_count > 1 else (value,))
+
+            # -1 is "all materials" in pmx, so an unknown name must not fall back to it
+            material_index = material_indices.get(offset["material_name"])
+            if material_index is None:
+                raise ValueError("unknown material %r in morph %r" % (offset["material_name"], name))
+            f.write(offset_struct.pack(material_index, offset["offset_type"], *values))
+
+        count += 1
+
+    end_position = f.tell()
+    f.seek(count_position)
+    f.write(int32.pack(count))
+    f.seek(end_position)
+
+    return count
+
+def read_morphs(f, materials, encoding=0, material_index_size=None):
+    if material_index_size is None:
+        material_index_size = get_material_index_size(len(materials))
+    offset_struct = get_offset_struct(material_index_size)
+
+    morphs = collections.OrderedDict()
+    count, = int32.unpack(f.read(int32.size))
+    for i in range(count):
+        name = read_text(f, encoding)
+        read_text(f, encoding)
+
+        panel, morph_type, offset_count = morph_header.unpack(f.read(morph_header.size))
+        offsets = []
+        for j in range(offset_count):
+            values = offset_struct.unpack(f.read(offset_struct.size))
+
+            offset = {}
+            offset["material_name"] = materials[values[0]] if values[0] >= 0 else None
+            offset["offset_type"] = values[1]
+
+            position = 2
+            for field, field_count in offset_fields:
+                value = list(values[position:position + field_count])
+                offset[field] = value if field_count > 1 else value[0]
+                position += field_count
+
+            offsets.append(offset)
+
+        morph = {}
+        morph["panel"] = panel
+        morph["type"] = morph_type
+        morph["offsets"] = offsets
+        morphs[name] = morph
+
+    return morphs
+
+def pack_morphs(morphs, materials, encoding=0, material_index_size=None):
+    f = io.BytesIO()
+    write_morphs(f, morphs, materials, encoding, material_index_size)
+    return f.getvalue()
+
+def unpack_morphs(data, materials, encoding=0, material_index_size=None):
+    return read_morphs(io.BytesIO(data), materials, encoding, material_index_size)
+
+def compare_morphs(binary_morphs, json_morphs):
+    # float32 rounding is ignored, the json values are the ones written to the binary
+    differences = []
+    if list(binary_morphs) != list(json_morphs):
+        differences.append("morph names differ")
+
+    for name in binary_morphs:
+        if name not in json_morphs:
+            continue
+        expected = json.loads(json.dumps(json_morphs[name]), parse_float=lambda s: struct.unpack("<f", struct.pack("<f", float(s)))[0])
+        if binary_morphs[name] != expected:
+            differences.append(name)
+
+    return differences
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a binary morph section against the json morph file.")
+    parser.add_argument("binary")
+    parser.add_argument("json")
+    parser.add_argument("--materials", nargs="+", required=True, help="material names in pmx order")
+    parser.add_argument("--encoding", type=int, default=0, choices=sorted(encodings))
+    args = parser.parse_args(argv)
+
+    with open(args.binary, "rb") as f:
+        binary_morphs = read_morphs(f, args.materials, args.encoding)
+    with open(args.json, encoding="utf-8") as f:
+        json_morphs = json.load(f, object_pairs_hook=collections.OrderedDict)
+
+    differences = compare_morphs(binary_morphs, json_morphs)
+    for difference in differences:
+        print("differs: " + difference)
+    print("%d morphs, %d differences" % (len(binary_morphs), len(differences)))
+
+    return 1 if differences else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
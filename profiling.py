@@ -0,0 +1,180 @@
+import bpy
+import collections
+import contextlib
+import csv
+import functools
+import io
+import json
+import os
+import time
+
+# Per-step timing of the execute() pipelines.
+#
+# @profiling.step decides at decoration time: when profiling is disabled the function is returned as is.
+# Enable it before the scripts are run, with the BLENDER_SCRIPTS_PROFILE environment variable or
+# profiling.enable() from the python console. Statistics are kept in this module and aggregated across runs.
+#
+# Per step: count, time, ops (bpy.ops calls) and bpy_data (bpy.data.<collection>.<method> calls such as
+# bpy.data.objects.new). bpy_data does not count the methods of the datablocks themselves (scene.objects.link,
+# modifiers.new, driver_add, foreach_set, ...), so it is not the total of data api calls.
+
+enabled = bool(os.environ.get("BLENDER_SCRIPTS_PROFILE"))
+
+Stat = collections.namedtuple("Stat", "count time ops bpy_data")
+
+stats = collections.OrderedDict() # name: [count, time, ops, bpy_data]
+counters = {"ops": 0, "bpy_data": 0}
+
+class OpsProxy():
+    # bpy.ops.<module>.<operator>(...) counted as an operator call
+    def __init__(self, ops, path=()):
+        self._ops = ops
+        self._path = path
+
+    def __getattr__(self, name):
+        return OpsProxy(getattr(self._ops, name), self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        counters["ops"] += 1
+        return self._ops(*args, **kwargs)
+
+class DataCollectionProxy():
+    # bpy.data.<collection>.<method>(...) counted as a bpy_data call
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def wrapper(*args, **kwargs):
+            counters["bpy_data"] += 1
+            return attr(*args, **kwargs)
+        return wrapper
+
+    def __iter__(self):
+        return iter(self._collection)
+
+    def __len__(self):
+        return len(self._collection)
+
+    def __contains__(self, key):
+        return key in self._collection
+
+    def __getitem__(self, key):
+        return self._collection[key]
+
+class DataProxy():
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        attr = getattr(self._data, name)
+        if hasattr(attr, "new") or hasattr(attr, "remove"):
+            return DataCollectionProxy(attr)
+        return attr
+
+original = {}
+depth = 0
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def install():
+    if not original:
+        original["ops"] = bpy.ops
+        original["data"] = bpy.data
+        bpy.ops = OpsProxy(bpy.ops)
+        bpy.data = DataProxy(bpy.data)
+
+def uninstall():
+    # a file loaded in between rebinds bpy.data, which is then kept
+    if original:
+        ops = original.pop("ops")
+        data = original.pop("data")
+        if isinstance(bpy.ops, OpsProxy):
+            bpy.ops = ops
+        if isinstance(bpy.data, DataProxy):
+            bpy.data = data
+
+def add(name, elapsed, ops, bpy_data):
+    stat = stats.get(name)
+    if stat is None:
+        stats[name] = [1, elapsed, ops, bpy_data]
+    else:
+        stat[0] += 1
+        stat[1] += elapsed
+        stat[2] += ops
+        stat[3] += bpy_data
+
+@contextlib.contextmanager
+def timer(name):
+    if not enabled:
+        yield
+        return
+
+    # the proxies are only installed while the outermost step runs, not for the rest of the session
+    global depth
+    if depth == 0:
+        install()
+    depth += 1
+    ops = counters["ops"]
+    bpy_data = counters["bpy_data"]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start, counters["ops"] - ops, counters["bpy_data"] - bpy_data)
+        depth -= 1
+        if depth == 0:
+            uninstall()
+
+def step(func):
+    if not enabled:
+        return func
+
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timer(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def reset():
+    stats.clear()
+
+def get_stats():
+    return collections.OrderedDict((name, Stat(*stat)) for name, stat in stats.items())
+
+def to_json():
+    return json.dumps({name: stat._asdict() for name, stat in get_stats().items()}, indent=2)
+
+def to_csv():
+    stream = io.StringIO()
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(("step",) + Stat._fields)
+    for name, stat in get_stats().items():
+        writer.writerow((name,) + tuple(stat))
+    return stream.getvalue()
+
+def dump(file_path):
+    value = to_csv() if file_path.endswith(".csv") else to_json()
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(value)
+
+def dump_text(text_name="profile"):
+    if not stats:
+        return
+
+    texts = bpy.data.texts
+    text = texts[text_name] if text_name in texts else texts.new(text_name)
+    text.clear()
+    text.write(to_csv())
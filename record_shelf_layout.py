@@ -0,0 +1,56 @@
+import argparse
+import concurrent.futures
+import functools
+import numpy as np
+import os
+
+# Record positions of a shelf, computed without bpy so layouts can be precomputed in worker processes
+# and applied later with Shelf.create(record_data, layout) / Shelf.create_instanced(layout).
+
+thickness = 0.004 # Record.thickness
+min_count = 10
+max_count = 20
+
+def create_layout(seed=None, scale=1.0, thickness=thickness, min_count=min_count, max_count=max_count):
+    random_state = np.random.RandomState(seed)
+
+    count = random_state.randint(min_count, max_count + 1)
+    spacing = random_state.uniform(thickness, thickness + 2.0 / scale, count)
+
+    return (np.cumsum(spacing) / scale).astype(np.float32)
+
+def create_layouts(seeds, scale=1.0, thickness=thickness, max_workers=None):
+    func = functools.partial(create_layout, scale=scale, thickness=thickness)
+    seeds = list(seeds)
+
+    if max_workers == 1:
+        return [func(seed) for seed in seeds]
+
+    workers = max_workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(func, seeds, chunksize=max(len(seeds) // (4 * workers), 1)))
+
+def save_layouts(file, seeds, layouts):
+    counts = np.array([len(layout) for layout in layouts], dtype=np.int32)
+    positions = np.concatenate(layouts) if layouts else np.zeros(0, dtype=np.float32)
+    np.savez(file, seeds=np.asarray(seeds), counts=counts, positions=positions)
+
+def load_layouts(file):
+    with np.load(file) as data:
+        layouts = np.split(data["positions"], np.cumsum(data["counts"])[:-1])
+        return dict(zip(data["seeds"].tolist(), layouts))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute record shelf layouts.")
+    parser.add_argument("output", help="npz file to write")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--shelves", type=int, default=1000)
+    parser.add_argument("--scale", type=float, default=1.0, help="unit_settings.scale_length of the target scene")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    seeds = range(args.first_seed, args.first_seed + args.shelves)
+    save_layouts(args.output, seeds, create_layouts(seeds, args.scale, max_workers=args.workers))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# Tile size selection for CPU rendering.
+#
+# Without calibration the size comes from a cost model: every thread renders ceil(tiles / threads) tiles in turn,
+# each costing its area plus a fixed per-tile overhead, so big tiles leave threads idle at the end of the frame
+# and small tiles pay the overhead many times. With calibration the best model candidates are rendered at a
+# reduced resolution in blender and the fastest one wins. Results are cached per machine, thread count and resolution.
+
+candidates = (8, 16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512)
+tile_overhead = 24 * 24 # per-tile cost in pixels
+cache_path = os.path.join(os.path.expanduser("~"), ".cache", "blender_scripts", "render_tiles.json")
+
+# the render settings the choice depends on, besides engine and device
+render_names = ("resolution_x", "resolution_y", "resolution_percentage", "threads_mode", "threads")
+
+def get_threads(render):
+    # render nodes often fix the thread count in the scene instead of using every cpu
+    if render.threads_mode == 'FIXED':
+        return max(render.threads, 1)
+    return os.cpu_count() or 1
+
+def get_resolution(render):
+    scale = render.resolution_percentage / 100.0
+    return max(int(render.resolution_x * scale), 1), max(int(render.resolution_y * scale), 1)
+
+def estimate_cost(width, height, tile, threads, overhead=tile_overhead):
+    columns = math.ceil(width / tile)
+    rows = math.ceil(height / tile)
+    rounds = math.ceil(columns * rows / threads)
+    tile_area = min(tile, width) * min(tile, height)
+    return rounds * (tile_area + overhead)
+
+def rank_tiles(width, height, threads, overhead=tile_overhead):
+    return sorted(candidates, key=lambda tile: (estimate_cost(width, height, tile, threads, overhead), -tile))
+
+def get_machine_key(width, height, threads):
+    return "%s/%s/%d/%dx%d" % (platform.node(), platform.machine(), threads, width, height)
+
+def get_cache_key(render, calibration=False):
+    # render: scene.render or any object with the attributes in render_names
+    width, height = get_resolution(render)
+    return get_machine_key(width, height, get_threads(render)) + ("/calibrated" if calibration else "")
+
+def load_cache(path=cache_path):
+    # a missing or unreadable cache (e.g. cut short by a crash) is empty
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache, path=cache_path):
+    # written to a temporary file and renamed, batch workers may save at the same time
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, suffix=".tmp", delete=False) as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(f.name, path)
+
+def calibrate(scene, tiles, percentage=25, samples=4):
+    # renders the scene at `percentage` with tiles scaled by the same factor, returns {full resolution tile: seconds}
+    render = scene.render
+    saved = (render.resolution_percentage, render.tile_x, render.tile_y, scene.cycles.samples)
+
+    times = {}
+    try:
+        render.resolution_percentage = max(saved[0] * percentage // 100, 1)
+        scene.cycles.samples = samples
+        for tile in tiles:
+            render.tile_x = render.tile_y = max(tile * percentage // 100, 1)
+            start = time.perf_counter()
+            bpy.ops.render.render()
+            times[tile] = time.perf_counter() - start
+    finally:
+        render.resolution_percentage, render.tile_x, render.tile_y, scene.cycles.samples = saved
+
+    return times
+
+def get_tile_size(scene, calibration=False, use_cache=True, path=cache_path, count=3):
+    # the engine, device and sampling settings of the scene are used as they are
+    width, height = get_resolution(scene.render)
+    threads = get_threads(scene.render)
+    key = get_cache_key(scene.render, calibration)
+
+    cache = load_cache(path) if use_cache else {}
+    if key in cache:
+        return cache[key]
+
+    tiles = rank_tiles(width, height, threads)
+    tile = tiles[0]
+    if calibration and bpy is not None:
+        times = calibrate(scene, tiles[:count])
+        tile = min(times, key=times.get)
+
+    if use_cache:
+        # reloaded, other workers may have added entries meanwhile
+        cache = load_cache(path)
+        cache[key] = tile
+        save_cache(cache, path)
+
+    return tile
@@ -1,91 +1,197 @@
 import bpy
-import logging
-import io
-
-logger = logging.getLogger("setting_pmx")
-
-if not logger.handlers:
-    hdlr = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-    hdlr.setFormatter(formatter)
-    logger.addHandler(hdlr)
-    logger.setLevel(logging.DEBUG) # DEBUG, INFO, WARNING, ERROR, CRITICAL
-
-logger.debug("init logger") # debug, info, warning, error, critical
-
-class LoggingToTextContext():
-    def __init__(self, logger):
-        self.logger = logger
-        self.stream = io.StringIO()
-        self.handler = logging.StreamHandler(self.stream)
-        formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
-        self.handler.setFormatter(formatter)
-        self.handler.setLevel(logging.INFO)
-        self.logger.addHandler(self.handler)
-
-    def __enter__(self):
-        return None
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        log_file_name = "log"
-        texts = bpy.data.texts
-        text = texts[log_file_name] if log_file_name in texts else texts.new(log_file_name)
-        text.clear()
-        text.write(self.stream.getvalue())
-
-        self.logger.removeHandler(self.handler)
-        self.stream.close()
+import bulk_edit
+import collections
+import hashlib
+import json
+import math
+import os
+import profiling
+import render_tiles
+import text_logging
+import types
+
+logger = text_logging.get_logger("setting_pmx")
+
+log_level = "INFO" # DEBUG, INFO, WARNING, ERROR, CRITICAL
+template_path = None # save the result as a template and load it instead of setting up again on later runs with the same settings
+profile = "gpu" # "gpu", "cpu" or a .json file of {"data path from scene": value}
+calibrate_tiles = False # render test frames to choose "auto" tile sizes instead of using the cost model
 
 class SettingPMX():
-
-    def __init__(self):
+    deleted_screens = ["3D View Full", "Game Logic", "Motion Tracking", "Video Editing"] # "Animation"
+
+    tile_paths = ("render.tile_x", "render.tile_y")
+
+    # scene settings by data path from the scene, applied in order
+    # "auto" tile sizes are chosen by render_tiles for the resolution and cpu count of this machine
+    profiles = {}
+    profiles["gpu"] = collections.OrderedDict([
+        ("unit_settings.system", 'IMPERIAL'),
+        ("unit_settings.scale_length", 409/900),
+        ("render.engine", 'CYCLES'),
+        ("render.tile_x", 512),
+        ("render.tile_y", 512),
+        ("cycles.device", 'GPU'),
+        ("cycles.feature_set", 'EXPERIMENTAL'),
+    ])
+    profiles["cpu"] = collections.OrderedDict(profiles["gpu"])
+    profiles["cpu"].update([
+        ("render.tile_x", "auto"),
+        ("render.tile_y", "auto"),
+        ("cycles.device", 'CPU'),
+    ])
+
+    def __init__(self, template_path=None, profile="gpu", calibrate_tiles=False):
         logger.info("start")
+
+        self.template_path = template_path
+        self.profile = profile
+        self.calibrate_tiles = calibrate_tiles
+        self.changes = []
+
         logger.info("end")
 
+    @profiling.step
     def execute(self):
         logger.info("start")
 
-        bpy.ops.object.select_all(action='SELECT')
-        bpy.ops.object.delete()
+        with bulk_edit.BulkEditContext(logger):
+            settings = self.get_settings()
+            template_path = self.get_template_path(bpy.context.scene, settings)
+            if template_path is not None and os.path.exists(template_path):
+                self.load_template(template_path)
+                logger.info("end")
+                return
 
-        # bpy.ops.screen.delete({'screen': bpy.data.screens["Animation"]})
-        bpy.ops.screen.delete({'screen': bpy.data.screens["3D View Full"]})
-        bpy.ops.screen.delete({'screen': bpy.data.screens["Game Logic"]})
-        bpy.ops.screen.delete({'screen': bpy.data.screens["Motion Tracking"]})
-        bpy.ops.screen.delete({'screen': bpy.data.screens["Video Editing"]})
-        bpy.context.window.screen = bpy.data.screens['Default']
+            self.delete_objects()
+            self.delete_screens()
 
-        bpy.ops.brush.curve_preset(shape='MAX')
+            bpy.ops.brush.curve_preset(shape='MAX')
 
-        self.scene_setting(bpy.context.scene)
+            self.scene_setting(bpy.context.scene, settings)
 
-        self.area_setting()
+            self.area_setting()
 
-        logger.info("end")
+            if template_path is not None:
+                self.save_template(template_path)
 
-    def scene_setting(self, scene):
-        scene.unit_settings.system = 'IMPERIAL'
-        scene.unit_settings.scale_length = 409/900
-        scene.render.engine = 'CYCLES'
-        scene.render.tile_x = 512
-        scene.render.tile_y = 512
-        scene.cycles.device = 'GPU'
-        scene.cycles.feature_set = 'EXPERIMENTAL'
+        logger.info("end")
 
+    @profiling.step
+    def delete_objects(self):
+        # same objects as select_all + object.delete: visible and selectable ones, objects that are also in other
+        # scenes are only unlinked from this one
+        scene = bpy.context.scene
+        objects = bpy.data.objects
+        for obj in list(scene.objects):
+            if not obj.is_visible(scene) or obj.hide_select:
+                continue
+            if len(obj.users_scene) > 1:
+                scene.objects.unlink(obj)
+            else:
+                objects.remove(obj, True)
+
+    @profiling.step
+    def delete_screens(self):
+        # screens can only be removed by the operator
+        screens = bpy.data.screens
+        for name in self.deleted_screens:
+            if name in screens:
+                bpy.ops.screen.delete({'screen': screens[name]})
+
+        if bpy.context.window is not None:
+            bpy.context.window.screen = screens['Default']
+
+    @profiling.step
+    def scene_setting(self, scene, settings):
+        # "auto" tile sizes are chosen once the rest of the profile (engine, device, resolution, threads) is applied,
+        # so that they are calibrated and cached for the settings they are used with
+        auto_paths = [path for path in self.tile_paths if settings.get(path) == "auto"]
+        self.changes = self.apply_settings(scene, collections.OrderedDict(
+            (path, value) for path, value in settings.items() if path not in auto_paths))
+        if auto_paths:
+            tile = render_tiles.get_tile_size(scene, self.calibrate_tiles)
+            logger.info("auto tile size: %d", tile)
+            self.changes += self.apply_settings(scene, collections.OrderedDict((path, tile) for path in auto_paths))
+
+        for path, old_value, value in self.changes:
+            logger.info("%s: %r -> %r", path, old_value, value)
+        logger.info("%d settings changed", len(self.changes))
+
+    def get_settings(self):
+        if self.profile in self.profiles:
+            return self.profiles[self.profile]
+
+        with open(self.profile, encoding="utf-8") as f:
+            return json.load(f, object_pairs_hook=collections.OrderedDict)
+
+    def get_template_path(self, scene, settings):
+        # one template per profile and settings, e.g. template_1a2b3c4d5e6f.blend, so that other profiles are not
+        # loaded from it. With "auto" tile sizes the key of the tile size cache is part of it (machine, thread count
+        # and resolution with the profile applied), so that templates are not shared between machines
+        if self.template_path is None:
+            return None
+
+        key = [self.profile, list(settings.items())]
+        if any(settings.get(path) == "auto" for path in self.tile_paths):
+            render = types.SimpleNamespace(**{name: settings.get("render." + name, getattr(scene.render, name))
+                                              for name in render_tiles.render_names})
+            key.append(render_tiles.get_cache_key(render, self.calibrate_tiles))
+        key = json.dumps(key)
+        root, ext = os.path.splitext(self.template_path)
+        return root + "_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12] + ext
+
+    def apply_settings(self, target, settings):
+        # writes only the values that differ, returns [(path, old value, new value)]
+        changes = []
+        for path, value in settings.items():
+            owner = target
+            names = path.split(".")
+            for name in names[:-1]:
+                owner = getattr(owner, name)
+
+            old_value = getattr(owner, names[-1])
+            if self.is_equal(old_value, value):
+                continue
+
+            setattr(owner, names[-1], value)
+            changes.append((path, old_value, value))
+
+        return changes
+
+    def is_equal(self, old_value, value):
+        # float properties are stored as float32
+        if isinstance(old_value, float) or isinstance(value, float):
+            return math.isclose(old_value, value, rel_tol=1e-6)
+        return old_value == value
+
+    @profiling.step
     def area_setting(self):
         for screen in bpy.data.screens:
             for area in screen.areas:
-                if area.type == 'VIEW_3D':
-                    override = bpy.context.copy()
-                    override["window"] = bpy.context.window
-                    override["screen"] = screen
-                    override["area"] = area
-                    bpy.ops.view3d.view_persportho(override)
-
-                    for space in area.spaces:
+                if area.type != 'VIEW_3D':
+                    continue
+
+                # orthographic like view3d.view_persportho from the default perspective view, but not a toggle
+                # so that running the setup again keeps it
+                area.spaces.active.region_3d.view_perspective = 'ORTHO'
+
+                for space in area.spaces:
+                    if space.type == 'VIEW_3D':
                         space.use_occlude_geometry = False
                         space.lens = 50
 
+    @profiling.step
+    def save_template(self, template_path):
+        bpy.ops.wm.save_as_mainfile(filepath=template_path, copy=True)
+        logger.info("save " + template_path)
+
+    @profiling.step
+    def load_template(self, template_path):
+        bpy.ops.wm.read_homefile(filepath=template_path)
+        logger.info("load " + template_path)
+
 if __name__ == "__main__":
-    with LoggingToTextContext(logger):
-        SettingPMX().execute()
+    with text_logging.LoggingToTextContext(logger, log_level):
+        SettingPMX(template_path, profile, calibrate_tiles).execute()
+    profiling.dump_text()
@@ -0,0 +1,65 @@
+import bpy
+import collections
+import logging
+
+formatter = logging.Formatter("%(levelname)-7s %(asctime)s %(message)s (%(funcName)s)", datefmt="%H:%M:%S")
+
+def get_logger(name, console_level=logging.WARNING):
+    logger = logging.getLogger(name)
+
+    if not logger.handlers:
+        hdlr = logging.StreamHandler()
+        hdlr.setFormatter(formatter)
+        hdlr.setLevel(console_level)
+        logger.addHandler(hdlr)
+        logger.setLevel(logging.INFO) # DEBUG, INFO, WARNING, ERROR, CRITICAL
+
+    return logger
+
+class RingBufferHandler(logging.Handler):
+    # keeps the last `capacity` records unformatted, they are formatted once in getvalue
+    def __init__(self, capacity=10000, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = collections.deque(maxlen=capacity)
+        self.dropped = 0
+
+    def emit(self, record):
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.records.append(record)
+
+    def getvalue(self):
+        lines = []
+        if self.dropped:
+            lines.append("(%d older records dropped)" % self.dropped)
+        lines.extend(self.format(record) for record in self.records)
+        return "\n".join(lines) + "\n" if lines else ""
+
+class LoggingToTextContext():
+    def __init__(self, logger, level=logging.INFO, capacity=10000, text_name="log", file_path=None):
+        self.logger = logger
+        self.level = level
+        self.text_name = text_name
+        self.file_path = file_path
+        self.handler = RingBufferHandler(capacity)
+        self.handler.setFormatter(formatter)
+        self.logger_level = logger.level
+
+    def __enter__(self):
+        self.logger.setLevel(self.level)
+        self.logger.addHandler(self.handler)
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.logger.removeHandler(self.handler)
+        self.logger.setLevel(self.logger_level)
+
+        value = self.handler.getvalue()
+        if self.file_path is None:
+            texts = bpy.data.texts
+            text = texts[self.text_name] if self.text_name in texts else texts.new(self.text_name)
+            text.clear()
+            text.write(value)
+        else:
+            with open(self.file_path, "w", encoding="utf-8") as f:
+                f.write(value)